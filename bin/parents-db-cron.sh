@@ -28,20 +28,11 @@ files_to_process=(
     "ftp://${NAS_USER}:${NAS_PASSWORD}@${NAS_IP}/1.2_FamilyExpenseSHARED/TDVisa6413_YTD2025.xlsx"
 )
 
-failed_files=()
-
-cd $GIT_PATH        
-for file in "${files_to_process[@]}"; do
-    echo "Processing $file"
-    if ! uv run python load-excel-transactions.py --filepath "$file" --cron true; then
-        echo "ERROR: Failed to process $file"
-        failed_files+=("$file")
-    fi    
-done
-cd -
-# Send Discord notification if any files failed
-if [ ${#failed_files[@]} -gt 0 ]; then
-    failed_list=$(printf '%s\n' "${failed_files[@]}")
-    error_message="⚠️ Parents Finance Cron Job: ${#failed_files[@]} file(s) failed to process:\n\`\`\`\n$failed_list\n\`\`\`"
+cd $GIT_PATH
+# load every workbook in one process, which reports the result of each file
+if ! uv run python load-excel-transactions.py --filepath "${files_to_process[@]}" --cron true --incremental; then
+    echo "ERROR: Failed to process some files"
+    error_message="⚠️ Parents Finance Cron Job: some of the ${#files_to_process[@]} file(s) failed to process, see the load report"
     send_discord_notification "$error_message"
 fi
+cd -
@@ -6,16 +6,24 @@ validation, and orchestration of the transaction loading process.
 """
 
 import argparse
+import json
 import os
 from sys import exit
 
+from config import Config
+from sources.api.transport import get_transport
 from sources.registry import (
+    AUTO_CARD_TYPE,
+    ONLINE_CARD_TYPE,
+    PLAN_CARD_TYPE,
     get_card_type_names,
     get_file_based_card_types,
     get_online_card_types,
 )
 from db.my_finance import MyFinanceDB
 from db.parents_finance import ParentsFinanceDB
+from services.ingest_manifest import IngestManifest
+from services.sync_state import SyncState
 from services.transaction_loader import TransactionLoader
 from services.transaction_processor import TransactionProcessor
 
@@ -55,9 +63,27 @@ Usage Examples:
   Multiple files in folder:
     python load-cc-transactions.py --type cibc_mc --folder /path/to/statements/ --database finance
 
+  Multiple files parsed in parallel:
+    python load-cc-transactions.py --type cibc_mc --folder /path/to/statements/ --database finance --jobs 4
+
+  Mixed folder, detecting the card type of each file:
+    python load-cc-transactions.py --type auto --folder /path/to/statements/ --database finance
+
   Wealthsimple (online, no file needed):
     python load-cc-transactions.py --type ws_debit --database finance
 
+  Every online source, fetched concurrently:
+    python load-cc-transactions.py --type online --database finance
+
+  Several card types in one run (a file or folder goes to the file-based type):
+    python load-cc-transactions.py --type ws_debit ws_credit cibc_mc --filepath /path/to/statement.csv --database finance
+
+  Every source listed in a plan file:
+    python load-cc-transactions.py --type all --plan plan.json --database finance
+
+  where plan.json maps card types to a "filepath" or "folder" ({{}} for online sources):
+    {{"cibc_mc": {{"folder": "/path/to/cibc/"}}, "auto": {{"folder": "/path/to/mixed/"}}, "online": {{}}}}
+
 Supported card types:
   {card_types_str}
         """,
@@ -66,9 +92,19 @@ Supported card types:
 
         parser.add_argument(
             "--type",
-            choices=supported_card_types,
+            choices=supported_card_types
+            + [AUTO_CARD_TYPE, ONLINE_CARD_TYPE, PLAN_CARD_TYPE],
+            nargs="+",
             required=True,
-            help="Type of credit card data to process",
+            help=f"Types of credit card data to process, {AUTO_CARD_TYPE} to detect it "
+            f"for each file, {ONLINE_CARD_TYPE} to fetch every online source, or "
+            f"{PLAN_CARD_TYPE} to process every source of --plan",
+        )
+        parser.add_argument(
+            "--plan",
+            required=False,
+            help=f"Path to a JSON plan mapping card types to a filepath or folder, "
+            f"used with --type {PLAN_CARD_TYPE}",
         )
         parser.add_argument(
             "--filepath", required=False, help="Path to the transaction data csv file"
@@ -83,11 +119,34 @@ Supported card types:
             required=True,
             help="Name of the database to use (finance or parents_finance)",
         )
+        parser.add_argument(
+            "--review",
+            action="store_true",
+            help="Ask once per unknown merchant instead of once per transaction",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Process files even if the ingest manifest shows they were already "
+            "loaded, and fetch the full history of online sources",
+        )
+        parser.add_argument(
+            "--allow-db-writes",
+            action="store_true",
+            help="Write the activity of a replay or synthetic ONLINE_TRANSPORT to the "
+            "database (use a scratch database)",
+        )
+        parser.add_argument(
+            "--jobs",
+            type=int,
+            default=1,
+            help="Number of files to parse in parallel when using --folder",
+        )
 
         return parser
 
     def _validate_arguments(
-        self, card_type: str, file_path: str, folder_path: str
+        self, card_type: str, file_path: str, folder_path: str, jobs: int = 1
     ) -> None:
         """
         Validate argument combinations for card type and file inputs.
@@ -96,17 +155,21 @@ Supported card types:
             card_type: The credit card type
             file_path: Path to single file (or None)
             folder_path: Path to folder (or None)
+            jobs: Number of files to parse in parallel
 
         Raises:
             ValueError: If argument combination is invalid
         """
+        if jobs < 1:
+            raise ValueError("--jobs must be at least 1")
+
         # Validate that --filepath and --folder are mutually exclusive
         if file_path and folder_path:
             raise ValueError(
                 "Cannot provide both --filepath and --folder. Please provide only one."
             )
 
-        online_types = get_online_card_types()
+        online_types = get_online_card_types() | {ONLINE_CARD_TYPE}
         file_based_types = get_file_based_card_types()
 
         if card_type in online_types:
@@ -114,7 +177,7 @@ Supported card types:
                 raise ValueError(
                     f"{card_type} doesn't use csv files, no need to provide --filepath or --folder"
                 )
-        elif card_type in file_based_types:
+        elif card_type in file_based_types or card_type == AUTO_CARD_TYPE:
             if not file_path and not folder_path:
                 raise ValueError(
                     f"Please provide either --filepath or --folder for {card_type} transactions"
@@ -137,7 +200,7 @@ Supported card types:
         Raises:
             ValueError: If folder doesn't exist or is empty
         """
-        online_types = get_online_card_types()
+        online_types = get_online_card_types() | {ONLINE_CARD_TYPE}
 
         if card_type in online_types:
             # Online cards don't use files, process once with no file
@@ -147,10 +210,10 @@ Supported card types:
             if not os.path.isdir(folder_path):
                 raise ValueError(f"Folder does not exist: {folder_path}")
 
-            # Get all files in the folder
+            # Get all files in the folder, sorted so runs are deterministic
             all_files = [
                 os.path.join(folder_path, f)
-                for f in os.listdir(folder_path)
+                for f in sorted(os.listdir(folder_path))
                 if os.path.isfile(os.path.join(folder_path, f))
             ]
 
@@ -164,6 +227,67 @@ Supported card types:
         else:
             return []
 
+    def _build_plan(
+        self,
+        card_types: list[str],
+        file_path: str,
+        folder_path: str,
+        plan_path: str,
+    ) -> list[tuple[str, str | None, str | None]]:
+        """
+        Build the list of sources to process in this run.
+
+        Args:
+            card_types: The --type values
+            file_path: Path to single file (or None)
+            folder_path: Path to folder (or None)
+            plan_path: Path to the plan file (or None)
+
+        Returns:
+            List of (card_type, file_path, folder_path) to validate and process
+
+        Raises:
+            ValueError: If the combination of types and inputs is invalid
+        """
+        if PLAN_CARD_TYPE in card_types:
+            if card_types != [PLAN_CARD_TYPE] or not plan_path:
+                raise ValueError(
+                    f"--type {PLAN_CARD_TYPE} must be used alone, with --plan"
+                )
+            if file_path or folder_path:
+                raise ValueError(
+                    f"--type {PLAN_CARD_TYPE} takes its files from --plan, "
+                    f"not --filepath or --folder"
+                )
+            with open(plan_path) as f:
+                plan = json.load(f)
+            valid_types = get_card_type_names() + [AUTO_CARD_TYPE, ONLINE_CARD_TYPE]
+            for card_type in plan:
+                if card_type not in valid_types:
+                    raise ValueError(f"Invalid card type in {plan_path}: {card_type}")
+            return [
+                (card_type, source.get("filepath"), source.get("folder"))
+                for card_type, source in plan.items()
+            ]
+        if plan_path:
+            raise ValueError(f"--plan is only used with --type {PLAN_CARD_TYPE}")
+
+        # the file or folder belongs to the single type that reads files
+        online_types = get_online_card_types() | {ONLINE_CARD_TYPE}
+        file_types = [t for t in card_types if t not in online_types]
+        if len(file_types) > 1:
+            raise ValueError(
+                f"Only one file-based --type can share --filepath or --folder, "
+                f"got {', '.join(file_types)}. Use --type {PLAN_CARD_TYPE} with a plan "
+                f"file instead."
+            )
+        return [
+            (card_type, None, None)
+            if card_type in online_types
+            else (card_type, file_path, folder_path)
+            for card_type in dict.fromkeys(card_types)
+        ]
+
     def _get_database_instance(self, database_name: str):
         """
         Get database instance based on database name.
@@ -199,31 +323,60 @@ Supported card types:
         """
         try:
             # Extract arguments
-            card_type = args.type
-            file_path = args.filepath
-            folder_path = args.folder
             database_name = args.database
+            plan = self._build_plan(args.type, args.filepath, args.folder, args.plan)
+
+            # Validate argument combinations and build the files of each source
+            files_to_process = []
+            for card_type, file_path, folder_path in plan:
+                self._validate_arguments(card_type, file_path, folder_path, args.jobs)
+                files_to_process.append(
+                    (
+                        card_type,
+                        self._build_file_list(card_type, file_path, folder_path),
+                    )
+                )
 
-            # Validate argument combinations
-            self._validate_arguments(card_type, file_path, folder_path)
-
-            # Build list of files to process
-            files_to_process = self._build_file_list(card_type, file_path, folder_path)
+            # Replayed or synthetic activity is not real: refuse to write it unless
+            # asked to, and never let it move the sync cursors. The transport
+            # only matters to runs fetching online sources.
+            fetches_online = any(None in files for _, files in files_to_process)
+            live_data = True
+            if fetches_online:
+                live_data = get_transport(Config().online_transport).live_data
+            if not live_data and not args.allow_db_writes:
+                raise ValueError(
+                    "ONLINE_TRANSPORT does not serve live activity, pass "
+                    "--allow-db-writes to write it to the database"
+                )
 
             # Load database
             print("Loading database...")
             database = self._get_database_instance(database_name)
             print("Database loaded\n")
 
-            # Initialize services
-            loader = TransactionLoader()
-            processor = TransactionProcessor(database, loader)
+            # Share one set of pooled connections for the whole run
+            with database:
+                # Initialize services
+                loader = TransactionLoader()
+                manifest = None if args.force else IngestManifest(database)
+                sync_state = (
+                    None if args.force or not live_data else SyncState(database)
+                )
+                processor = TransactionProcessor(
+                    database,
+                    loader,
+                    review=args.review,
+                    jobs=args.jobs,
+                    manifest=manifest,
+                    sync_state=sync_state,
+                )
 
-            # Process files
-            results = processor.process_files(card_type, files_to_process)
+                # Process the files of every source
+                results = processor.process_plan(files_to_process)
 
-            # Print summary
-            results.print_summary(len(files_to_process))
+            # Print summary, counting each online source fetched
+            results.print_summary(len(results.results))
 
         except Exception as e:
             print(f"ERROR: {e}")
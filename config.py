@@ -7,6 +7,9 @@ class Config:
     postgres_connection_string: str
     ws_debt_link: str
     ws_credit_link: str
+    excel_cache_dir: str
+    ftp_state_path: str
+    online_transport: str
     debug: bool
 
     def __init__(self, debug: bool = False):
@@ -17,8 +20,18 @@ class Config:
         self.postgres_connection_string = os.getenv("POSTGRES_CONNECTION_STRING")
         self.ws_debt_link = os.getenv("WS_DEBIT_LINK")
         self.ws_credit_link = os.getenv("WS_CREDIT_LINK")
+        self.excel_cache_dir = os.getenv("EXCEL_CACHE_DIR") or os.path.join(
+            os.path.expanduser("~"), ".cache", "mypersonalfinance", "excel"
+        )
+        self.ftp_state_path = os.getenv("FTP_STATE_PATH") or os.path.join(
+            os.path.expanduser("~"), ".cache", "mypersonalfinance", "ftp_state.json"
+        )
+        self.online_transport = os.getenv("ONLINE_TRANSPORT", "live")
         self.debug = debug
         if self.debug:
             print(f"{self.postgres_connection_string=}")
             print(f"{self.ws_debt_link=}")
             print(f"{self.ws_credit_link=}")
+            print(f"{self.excel_cache_dir=}")
+            print(f"{self.ftp_state_path=}")
+            print(f"{self.online_transport=}")
@@ -1,4 +1,8 @@
+import threading
+import time
 from abc import ABC
+from collections.abc import Iterator
+from contextlib import contextmanager
 
 import polars as pl
 import psycopg
@@ -9,6 +13,13 @@ from config import Config
 class PostgresDB(ABC):
     """
     Abstract base class for Postgres databases.
+
+    Connections are pooled and reused for the lifetime of the instance instead of
+    being opened per query. Use the instance as a context manager (or call
+    `close()`) to release them at the end of a run.
+
+    Inside a `transaction()` block every query runs on the same connection and
+    is committed once when the block exits.
     """
 
     pl.Config.set_fmt_str_lengths(900)
@@ -17,6 +28,10 @@ class PostgresDB(ABC):
 
     database_name: str
     uri: str
+    # maximum number of idle connections kept open for reuse
+    pool_size: int = 4
+    # idle connections older than this many seconds are pinged before reuse
+    health_check_interval: float = 30.0
 
     def __init__(self, database_name: str, debug: bool = False):
         """
@@ -25,21 +40,145 @@ class PostgresDB(ABC):
         self.config = Config(debug=debug)
         self.database_name = database_name
         self.uri = f"{self.config.postgres_connection_string}/{self.database_name}"
+        # idle pool of (connection, time it was returned to the pool)
+        self._idle: list[tuple[psycopg.Connection, float]] = []
+        self._pool_lock = threading.Lock()
+        # connection pinned by an open `transaction()` block
+        self._transaction_conn: psycopg.Connection | None = None
         if self.config.debug:
             print(f"{self.uri=}")
             print(f"{self.database_name=}")
 
+    def __enter__(self) -> "PostgresDB":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
     def connect(self) -> psycopg.Connection:
         """
-        Connect to the database.
+        Open a new connection to the database.
         """
         return psycopg.connect(self.uri)
 
+    def _is_healthy(self, conn: psycopg.Connection, idle_since: float) -> bool:
+        """
+        Check that a pooled connection can still be used.
+        Connections idle for longer than `health_check_interval` are pinged.
+        """
+        if conn.closed or conn.broken:
+            return False
+        if time.monotonic() - idle_since < self.health_check_interval:
+            return True
+        try:
+            conn.execute("select 1")
+            conn.rollback()
+            return True
+        except psycopg.Error:
+            return False
+
+    def _acquire(self) -> psycopg.Connection:
+        """
+        Take a healthy connection from the pool, opening a new one if needed.
+        """
+        while True:
+            with self._pool_lock:
+                if not self._idle:
+                    break
+                conn, idle_since = self._idle.pop()
+            if self._is_healthy(conn, idle_since):
+                return conn
+            conn.close()
+        return self.connect()
+
+    def _release(self, conn: psycopg.Connection) -> None:
+        """
+        Return a connection to the pool, closing it if the pool is full or it is unusable.
+        """
+        if conn.closed or conn.broken:
+            conn.close()
+            return
+        with self._pool_lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append((conn, time.monotonic()))
+                return
+        conn.close()
+
+    @property
+    def in_transaction(self) -> bool:
+        """
+        Whether a `transaction()` block is open.
+        """
+        return self._transaction_conn is not None
+
+    @contextmanager
+    def connection(self) -> Iterator[psycopg.Connection]:
+        """
+        Borrow a pooled connection for the duration of the block.
+        Any open transaction is rolled back if the block raises, and the
+        connection is discarded if it can't be rolled back.
+        Inside a `transaction()` block the pinned connection is used instead.
+        """
+        if self._transaction_conn is not None:
+            yield self._transaction_conn
+            return
+        conn = self._acquire()
+        try:
+            yield conn
+        except BaseException:
+            # a broken connection can't roll back; keep the original error
+            try:
+                if not conn.closed:
+                    conn.rollback()
+            except psycopg.Error:
+                conn.close()
+            raise
+        finally:
+            self._release(conn)
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """
+        Run every query in the block in a single database transaction.
+
+        The transaction is committed once when the block exits and rolled back if
+        it raises. Nested blocks create savepoints, so a failed inner block only
+        undoes its own changes.
+        """
+        if self._transaction_conn is not None:
+            try:
+                with self._transaction_conn.transaction():
+                    yield
+            except BaseException:
+                self._on_rollback()
+                raise
+            return
+        with self.connection() as conn:
+            self._transaction_conn = conn
+            try:
+                with conn.transaction():
+                    yield
+            except BaseException:
+                self._on_rollback()
+                raise
+            finally:
+                self._transaction_conn = None
+
+    def _on_rollback(self) -> None:
+        """
+        Called when a `transaction()` block or savepoint is rolled back.
+        Subclasses drop any in-memory state that was written through.
+        """
+        return
+
     def close(self) -> None:
         """
-        Close the database connection.
+        Close all pooled database connections.
         """
-        self.conn.close()
+        with self._pool_lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            conn.close()
 
     def insert(self, query: str, args: tuple) -> None:
         """
@@ -48,10 +187,38 @@ class PostgresDB(ABC):
         if self.config.debug:
             print(f"{query=}")
             print(f"{args=}")
-        with self.connect() as conn:
+        with self.connection() as conn:
             with conn.cursor() as cur:
                 cur.execute(query, args)
+            if not self.in_transaction:
+                conn.commit()
+
+    def execute_pipeline(self, query: str, args_list: list[tuple]) -> list[list[tuple]]:
+        """
+        Run the same query once per argument tuple in a single round trip.
+
+        The statements are sent in psycopg pipeline mode as a prepared statement,
+        so the server parses the query once and the client does not wait for each
+        result before sending the next query.
+
+        Returns:
+            The rows returned by each execution, in order (empty for statements
+            without a result set)
+        """
+        if self.config.debug:
+            print(f"{query=}")
+            print(f"{len(args_list)} pipelined executions")
+        if not args_list:
+            return []
+        with self.connection() as conn:
+            with conn.pipeline():
+                cursors = [
+                    conn.execute(query, args, prepare=True) for args in args_list
+                ]
+            results = [cur.fetchall() if cur.description else [] for cur in cursors]
+            if not self.in_transaction:
                 conn.commit()
+        return results
 
     def select(self, query: str, args: tuple | None = None) -> list[tuple]:
         """
@@ -60,7 +227,11 @@ class PostgresDB(ABC):
         if self.config.debug:
             print(f"{query=}")
             print(f"{args=}")
-        with self.connect() as conn:
+        with self.connection() as conn:
             with conn.cursor() as cur:
                 cur.execute(query, args)
-                return cur.fetchall()
+                result = cur.fetchall()
+            # end the implicit read transaction so the connection goes back idle
+            if not self.in_transaction:
+                conn.rollback()
+            return result
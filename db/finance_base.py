@@ -2,13 +2,202 @@ from abc import abstractmethod
 from datetime import date
 from typing import Any
 
+import polars as pl
+
 from db.base import PostgresDB
+from db.reference_data import ReferenceData
+from utils.substring_matcher import SubstringMatcher
 
 
 class FinanceDB(PostgresDB):
+    # columns of a fully-resolved expense row and their postgres types, used by
+    # the bulk COPY writer
+    expense_columns: dict[str, str] = {
+        "date": "date",
+        "merchant": "text",
+        "cost": "numeric",
+        "category_id": "int4",
+    }
+
+    # expenses the user skipped at the category prompt
+    skipped_expense_count: int = 0
+
+    # exact merchant name auto-match table and the label columns it maps to
+    auto_match_table: str
+    auto_match_label_columns: list[str] = ["merchant_category"]
+    # merchants never offered for the auto-match table
+    auto_match_excluded_merchants: list[str] = []
+    # substring_auto_match columns compiled into the substring matcher
+    substring_rule_columns: list[str] = ["substring", "merchant_category"]
+
+    # category reference data shared by every instance in the process, keyed by uri
+    _reference_data: dict[str, ReferenceData] = {}
+    # compiled substring_auto_match rules, keyed by uri
+    _substring_matchers: dict[str, SubstringMatcher] = {}
+    # exact merchant name -> label tuples of the auto-match table, keyed by uri
+    _auto_match_indexes: dict[str, dict[str, list[tuple]]] = {}
+
     def __init__(self, database_name: str, debug: bool = False):
         super().__init__(database_name=database_name, debug=debug)
 
+    @property
+    def reference_data(self) -> ReferenceData:
+        """
+        Category reference data, loaded from the database on first use.
+        """
+        if self.uri not in self._reference_data:
+            categories = self.select("select id, name from categories")
+            self._reference_data[self.uri] = ReferenceData(
+                categories, self._select_subcategories()
+            )
+        return self._reference_data[self.uri]
+
+    def invalidate_reference_data(self) -> None:
+        """
+        Drop the cached category reference data.
+        Call this after adding or renaming categories or subcategories.
+        """
+        self._reference_data.pop(self.uri, None)
+
+    @property
+    def substring_matcher(self) -> SubstringMatcher:
+        """
+        The substring_auto_match rules compiled into a matcher, loaded on first use.
+        """
+        if self.uri not in self._substring_matchers:
+            columns = self.substring_rule_columns
+            rules = pl.DataFrame(
+                self.select(f"select {', '.join(columns)} from substring_auto_match"),
+                schema={column: pl.Utf8 for column in columns},
+                orient="row",
+            )
+            self._substring_matchers[self.uri] = SubstringMatcher(rules)
+        return self._substring_matchers[self.uri]
+
+    def invalidate_substring_matcher(self) -> None:
+        """
+        Drop the compiled substring rules.
+        Call this after changing the substring_auto_match table.
+        """
+        self._substring_matchers.pop(self.uri, None)
+
+    @property
+    def auto_match_index(self) -> dict[str, list[tuple]]:
+        """
+        The exact merchant name auto-match table held in memory, loaded on first use.
+        """
+        if self.uri not in self._auto_match_indexes:
+            columns = ", ".join(self.auto_match_label_columns)
+            index: dict[str, list[tuple]] = {}
+            for merchant_name, *labels in self.select(
+                f"select merchant_name, {columns} from {self.auto_match_table}"
+            ):
+                index.setdefault(merchant_name, []).append(tuple(labels))
+            self._auto_match_indexes[self.uri] = index
+        return self._auto_match_indexes[self.uri]
+
+    def get_exact_auto_match(self, merchant: str) -> tuple | None:
+        """
+        Get the auto-match labels for an exact merchant name, without querying.
+
+        Raises:
+            ValueError: If the merchant is mapped to more than one category
+        """
+        matches = self.auto_match_index.get(merchant, [])
+        if len(matches) > 1:
+            raise ValueError(
+                f"Multiple categories found for {merchant}. Something is wrong."
+            )
+        return matches[0] if matches else None
+
+    def _match_auto_match_rules(self, merchants: pl.Series) -> pl.DataFrame:
+        """
+        Label every merchant from the exact-match table, falling back to the
+        substring rules, in a single pass.
+
+        Returns:
+            pl.DataFrame: One row per merchant with the auto-match label columns
+            (null when nothing matched)
+
+        Raises:
+            ValueError: If a merchant is mapped to more than one category
+        """
+        labels = self.auto_match_label_columns
+        conflicting = merchants.filter(
+            merchants.is_in(
+                [m for m, matches in self.auto_match_index.items() if len(matches) > 1]
+            )
+        )
+        if conflicting.len() > 0:
+            raise ValueError(
+                f"Multiple categories found for {conflicting[0]}. Something is wrong."
+            )
+        exact = pl.DataFrame(
+            [
+                (merchant, *matches[0])
+                for merchant, matches in self.auto_match_index.items()
+            ],
+            schema={"merchant": pl.Utf8} | {label: pl.Utf8 for label in labels},
+            orient="row",
+        )
+        exact_matches = (
+            merchants.to_frame("merchant")
+            .join(exact, on="merchant", how="left", maintain_order="left")
+            .select(labels)
+        )
+        substring_matches = self.substring_matcher.match_column(merchants)
+        ambiguous = merchants.filter(
+            substring_matches.get_column("substring_candidates").is_not_null()
+            & exact_matches.get_column(labels[0]).is_null()
+        )
+        if ambiguous.len() > 0:
+            print(
+                "Ambiguous substring matches, needs manual categorization: "
+                f"{', '.join(ambiguous.unique(maintain_order=True).to_list())}"
+            )
+        matches = pl.concat(
+            [
+                exact_matches,
+                substring_matches.select(
+                    pl.col(label).alias(f"substring_{label}") for label in labels
+                ),
+            ],
+            how="horizontal",
+        )
+        # an exact merchant name match takes precedence over the substring rules
+        return matches.select(
+            pl.when(pl.col(labels[0]).is_not_null())
+            .then(pl.col(label))
+            .otherwise(pl.col(f"substring_{label}"))
+            .alias(label)
+            for label in labels
+        )
+
+    def _insert_auto_match(self, merchant: str, *labels: str) -> None:
+        """
+        Insert a merchant into the auto-match table and the in-memory index.
+        """
+        columns = ", ".join(["merchant_name", *self.auto_match_label_columns])
+        placeholders = ", ".join(["%s"] * (len(labels) + 1))
+        query = (
+            f"insert into {self.auto_match_table} ({columns}) values ({placeholders})"
+        )
+        self.insert(query, (merchant, *labels))
+        matches = self.auto_match_index.setdefault(merchant, [])
+        if labels not in matches:
+            matches.append(labels)
+
+    def _on_rollback(self) -> None:
+        # auto-match rows written during the rolled back transaction are gone
+        self._auto_match_indexes.pop(self.uri, None)
+
+    def _select_subcategories(self) -> list[tuple[int, str, int]]:
+        """
+        Get (id, name, category_id) rows for the subcategories table.
+        Databases without subcategories return no rows.
+        """
+        return []
+
     @abstractmethod
     def insert_expense(self, *_: Any, **__: Any) -> None:
         """
@@ -24,6 +213,54 @@ class FinanceDB(PostgresDB):
         """
         return
 
+    @abstractmethod
+    def categorize_expenses(
+        self, df: pl.DataFrame, card_type: str
+    ) -> tuple[pl.DataFrame, pl.DataFrame]:
+        """
+        Categorize a whole statement at once without asking the user.
+
+        Returns:
+            Tuple of (resolved, unresolved). Resolved rows carry the id columns of
+            `expense_columns` and can go straight to `bulk_insert_expenses`.
+            Unresolved rows need a human to pick a category.
+        """
+        return
+
+    @abstractmethod
+    def ask_for_category(self) -> dict[str, int] | None:
+        """
+        Ask the user to select a category for an expense.
+        Returns the id columns for the expense, or None if the user skips.
+        """
+        return
+
+    @abstractmethod
+    def get_auto_match_labels(self, expense_ids: dict[str, int]) -> tuple[str, ...]:
+        """
+        Get the names to store in the auto_match table for the given expense ids.
+        """
+        return
+
+    def filter_insertable_expenses(self, df: pl.DataFrame) -> pl.DataFrame:
+        """
+        Drop categorized rows that must not be inserted.
+        """
+        return df
+
+    def confirm_add_to_auto_match(self) -> bool:
+        """
+        Ask the user whether to add a merchant to the auto_match table.
+        """
+        while True:
+            add_to_auto_match = input("Add to auto_match table? (y/n): ")
+            if add_to_auto_match == "y":
+                return True
+            elif add_to_auto_match == "n":
+                return False
+            else:
+                print("Please enter a valid response (y/n).")
+
     @abstractmethod
     def insert_into_auto_match(
         self, merchant: str, category: str, subcategory: str
@@ -42,24 +279,152 @@ class FinanceDB(PostgresDB):
         params = tuple(filters.values())
         return len(self.select(query, params)) > 0
 
-    def check_if_expense_exists(self, date: date, merchant: str, cost: float) -> bool:
-        return self._check_exists(
-            "expenses", {"date": date, "merchant": merchant, "cost": cost}
+    def filter_new_expenses(self, df: pl.DataFrame) -> pl.DataFrame:
+        """
+        Return the rows of a statement that are not already in the expenses table.
+
+        All (date, merchant, cost) keys are checked in a single query restricted to
+        the statement's date range. Rows repeating a key earlier in the same
+        statement are dropped as well, since the unique constraint on expenses
+        would reject them.
+        """
+        if df.height == 0:
+            return df
+        keys = ["date", "merchant", "cost"]
+        df = df.unique(subset=keys, keep="first", maintain_order=True)
+        query = """
+        select k.idx - 1
+        from unnest(%s::date[], %s::text[], %s::numeric[])
+            with ordinality as k(date, merchant, cost, idx)
+        where exists (
+            select 1 from expenses e
+            where e.date between %s and %s
+                and e.date = k.date
+                and e.merchant = k.merchant
+                and e.cost = k.cost
+        )
+        """
+        dates = df.get_column("date")
+        args = (
+            dates.to_list(),
+            df.get_column("merchant").to_list(),
+            df.get_column("cost").to_list(),
+            dates.min(),
+            dates.max(),
+        )
+        existing = [row[0] for row in self.select(query, args)]
+        print(f"{len(existing)}/{df.height} transactions already exist in expenses")
+        return (
+            df.with_row_index("_row")
+            .filter(~pl.col("_row").is_in(existing))
+            .drop("_row")
         )
 
-    def get_expense_id(self, date: date, merchant: str, cost: float) -> int:
+    def bulk_insert_expenses(self, df: pl.DataFrame) -> tuple[int, int]:
         """
-        Get the id of an expense in the database.
+        Insert fully-resolved expenses in bulk.
+
+        Rows are loaded with a binary COPY into a temporary staging table and
+        moved into expenses with ON CONFLICT (date, merchant, cost) DO NOTHING,
+        so rows that already exist are skipped instead of failing the batch.
+
+        Returns:
+            Tuple of (inserted_rows, skipped_rows)
+        """
+        if df.height == 0:
+            return (0, 0)
+        columns = list(self.expense_columns)
+        column_list = ", ".join(columns)
+        rows = df.select(columns).with_columns(pl.col("cost").cast(pl.Decimal(10, 2)))
+        if self.config.debug:
+            print(f"Bulk inserting {rows.height} expenses")
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    f"create temp table expenses_staging on commit drop as "
+                    f"select {column_list} from expenses with no data"
+                )
+                with cur.copy(
+                    f"copy expenses_staging ({column_list}) from stdin (format binary)"
+                ) as copy:
+                    copy.set_types(list(self.expense_columns.values()))
+                    for row in rows.iter_rows():
+                        copy.write_row(row)
+                cur.execute(
+                    f"insert into expenses ({column_list}) "
+                    f"select {column_list} from expenses_staging "
+                    f"on conflict (date, merchant, cost) do nothing"
+                )
+                inserted = cur.rowcount
+                cur.execute("drop table expenses_staging")
+            if not self.in_transaction:
+                conn.commit()
+        return (inserted, rows.height - inserted)
+
+    def delete_expenses_if_exist(self, df: pl.DataFrame) -> int:
+        """
+        Delete every expense matching a (date, merchant, cost) row of the DataFrame.
+
+        The deletes are pipelined, so the whole batch costs one round trip.
+
+        Returns:
+            Number of expenses deleted
         """
         query = (
-            "select id from expenses where date = %s and merchant = %s and cost = %s"
+            "delete from expenses where date = %s and merchant = %s and cost = %s "
+            "returning id"
+        )
+        results = self.execute_pipeline(
+            query, df.select("date", "merchant", "cost").rows()
         )
-        result = self.select(query, (date, merchant, cost))
-        return result[0][0]
+        return sum(len(rows) for rows in results)
+
+    def get_ingested_files(self, card_type: str) -> list[tuple[str, int, int]]:
+        """
+        Get (content_hash, size, row_count) of every file of a card type in the
+        ingest manifest.
+        """
+        query = "select content_hash, size, row_count from ingest_manifest where card_type = %s"
+        return self.select(query, (card_type,))
 
-    def delete_expense(self, expense_id: int) -> None:
+    def record_ingested_file(
+        self,
+        file_name: str,
+        content_hash: str,
+        size: int,
+        card_type: str,
+        row_count: int,
+        run_id: str,
+    ) -> None:
         """
-        Delete an expense from the database.
+        Add a loaded file to the ingest manifest.
         """
-        query = "delete from expenses where id = %s"
-        self.insert(query, (expense_id,))
+        query = (
+            "insert into ingest_manifest "
+            "(file_name, content_hash, size, card_type, row_count, run_id) "
+            "values (%s, %s, %s, %s, %s, %s) "
+            "on conflict (card_type, content_hash) do nothing"
+        )
+        self.insert(
+            query, (file_name, content_hash, size, card_type, row_count, run_id)
+        )
+
+    def get_sync_cursor(self, source: str) -> date | None:
+        """
+        Get the date of the newest transaction synced from an online source.
+        """
+        query = "select last_date from sync_state where source = %s"
+        result = self.select(query, (source,))
+        return result[0][0] if result else None
+
+    def set_sync_cursor(self, source: str, last_date: date) -> None:
+        """
+        Advance the sync cursor of an online source. The cursor never moves back.
+        """
+        query = (
+            "insert into sync_state (source, last_date) values (%s, %s) "
+            "on conflict (source) do update set "
+            "last_date = greatest(sync_state.last_date, excluded.last_date), "
+            "updated_at = now()"
+        )
+        self.insert(query, (source, last_date))
@@ -7,27 +7,43 @@ from sources.ref_data import reimbursement_merchant_ref
 from sources.csv.rogers import RogersStatement
 from sources.csv.simplii_visa import SimpliiVisaStatement
 from db.finance_base import FinanceDB
+from db.reference_data import normalize_name_expr
 
 
 class MyFinanceDB(FinanceDB):
     reimbursement_subcategory_id = 14
+    expense_columns = FinanceDB.expense_columns | {"subcategory_id": "int4"}
+    auto_match_table = "merchant_name_auto_match"
+    auto_match_label_columns = FinanceDB.auto_match_label_columns + [
+        "merchant_subcategory"
+    ]
+    substring_rule_columns = FinanceDB.substring_rule_columns + ["merchant_subcategory"]
+    auto_match_excluded_merchants = ["Interac e-Transfer® Out"]
 
     def __init__(self, debug: bool = False):
         super().__init__(database_name="finance", debug=debug)
 
-    def get_subcategory_id_from_name(self, subcategory_name: str) -> int:
+    def _select_subcategories(self) -> list[tuple[int, str, int]]:
+        return self.select("select id, name, category_id from subcategories")
+
+    def get_subcategory_id_from_name(
+        self, subcategory_name: str, category_name: str | None = None
+    ) -> int:
         """
         Get the subcategory id from the subcategory name.
         """
-        query = "select id from subcategories where name = %s"
-        return self.select(query, (subcategory_name,))[0][0]
+        subcategory_id = self.reference_data.get_subcategory_id(
+            subcategory_name, category_name
+        )
+        if subcategory_id is None:
+            raise ValueError(f"Subcategory {subcategory_name} not found.")
+        return subcategory_id
 
     def get_category_id_from_subcategory_id(self, subcategory_id: int) -> int:
         """
         Get the category id from the subcategory id.
         """
-        query = "select category_id from subcategories where id = %s"
-        return self.select(query, (subcategory_id,))[0][0]
+        return self.reference_data.subcategory_category_ids[subcategory_id]
 
     def get_category_and_subcategory_name_from_subcategory_id(
         self, subcategory_id: int
@@ -35,30 +51,17 @@ class MyFinanceDB(FinanceDB):
         """
         Get the category and subcategory name from the subcategory id.
         """
-        query = "select c.name as category, s.name as subcategory from categories c join subcategories s on c.id = s.category_id where s.id = %s"
-        return self.select(query, (subcategory_id,))[0]
+        category_id = self.get_category_id_from_subcategory_id(subcategory_id)
+        return (
+            self.reference_data.category_names[category_id],
+            self.reference_data.subcategory_names[subcategory_id],
+        )
 
     def get_subcategory_and_category(self) -> pl.DataFrame:
         """
         Get all subcategories and categories.
         """
-        query = """
-        select 
-            subcategories.id as subcategory_id, 
-            subcategories.name as subcategory, 
-            categories.name as category 
-        from subcategories 
-            join categories on 
-                subcategories.category_id = categories.id
-        """
-        schema = {
-            "subcategory_id": pl.Int64,
-            "subcategory": pl.Utf8,
-            "category": pl.Utf8,
-        }
-        return pl.DataFrame(self.select(query), schema=schema, orient="row").sort(
-            by=["category", "subcategory"]
-        )
+        return self.reference_data.subcategories_df
 
     def check_if_reimbursement_expense_exists(self, date: date, merchant: str) -> bool:
         """
@@ -66,6 +69,124 @@ class MyFinanceDB(FinanceDB):
         """
         return self._check_exists("expenses", {"date": date, "merchant": merchant})
 
+    def filter_insertable_expenses(self, df: pl.DataFrame) -> pl.DataFrame:
+        """
+        Drop reimbursement rows whose (date, merchant) is already in expenses.
+
+        Reimbursements can be re-issued with a different cost, so they are
+        deduplicated on date and merchant only, in a single query.
+        """
+        needs_check = pl.col("subcategory_id") == self.reimbursement_subcategory_id
+        for reimbursement_merchant in reimbursement_merchant_ref:
+            needs_check = needs_check | pl.lit(
+                reimbursement_merchant.lower()
+            ).str.contains(pl.col("merchant").str.to_lowercase(), literal=True)
+        df = df.with_columns(needs_check.alias("needs_check"))
+        reimbursements = df.filter(pl.col("needs_check")).unique(
+            subset=["date", "merchant"], keep="first", maintain_order=True
+        )
+        if reimbursements.height == 0:
+            return df.drop("needs_check")
+        query = """
+        select k.date, k.merchant
+        from unnest(%s::date[], %s::text[]) as k(date, merchant)
+        where exists (
+            select 1 from expenses e
+            where e.date = k.date and e.merchant = k.merchant
+        )
+        """
+        existing = pl.DataFrame(
+            self.select(
+                query,
+                (
+                    reimbursements.get_column("date").to_list(),
+                    reimbursements.get_column("merchant").to_list(),
+                ),
+            ),
+            schema={"date": pl.Date, "merchant": pl.Utf8},
+            orient="row",
+        )
+        for row in existing.iter_rows(named=True):
+            print(
+                f"Record already exists for {row['date']} at {row['merchant']}. Skipping..."
+            )
+        return pl.concat(
+            [
+                df.filter(~pl.col("needs_check")),
+                reimbursements.join(existing, on=["date", "merchant"], how="anti"),
+            ]
+        ).drop("needs_check")
+
+    def categorize_expenses(
+        self, df: pl.DataFrame, card_type: str
+    ) -> tuple[pl.DataFrame, pl.DataFrame]:
+        """
+        Categorize a whole statement at once without asking the user.
+
+        Rules are applied in the same order as `insert_expense`: the Rogers
+        reference data (by cc_category) or the fixed Simplii Visa category, then
+        the exact merchant name auto-match table, then the substring rules.
+
+        Returns:
+            Tuple of (resolved, unresolved) rows
+        """
+        labels = self.auto_match_label_columns
+        matches = self._match_auto_match_rules(df.get_column("merchant"))
+        if card_type == "rogers":
+            # only rogers cc uses cc_category, so try ref rogers automatch first
+            rogers_ref = pl.DataFrame(
+                [
+                    (cc_category, *category)
+                    for cc_category, category in (
+                        RogersStatement.auto_match_categories().items()
+                    )
+                ],
+                schema={"cc_category": pl.Utf8} | {label: pl.Utf8 for label in labels},
+                orient="row",
+            )
+            rogers_matches = (
+                df.select(pl.col("cc_category").cast(pl.Utf8))
+                .join(rogers_ref, on="cc_category", how="left", maintain_order="left")
+                .select(labels)
+            )
+            matches = pl.concat(
+                [rogers_matches, matches.select(pl.all().name.prefix("auto_"))],
+                how="horizontal",
+            ).select(
+                pl.when(pl.col(labels[0]).is_not_null())
+                .then(pl.col(label))
+                .otherwise(pl.col(f"auto_{label}"))
+                .alias(label)
+                for label in labels
+            )
+        elif card_type == "simplii_visa":
+            category, subcategory = SimpliiVisaStatement.auto_match_category()
+            matches = df.select(
+                pl.lit(category).alias(labels[0]), pl.lit(subcategory).alias(labels[1])
+            )
+
+        categorized = (
+            pl.concat([df, matches], how="horizontal")
+            .with_columns(
+                normalize_name_expr(pl.col(labels[0])).alias("category_key"),
+                normalize_name_expr(pl.col(labels[1])).alias("subcategory_key"),
+            )
+            .join(
+                self.reference_data.subcategory_keys_df,
+                on=["category_key", "subcategory_key"],
+                how="left",
+                maintain_order="left",
+            )
+            .drop("category_key", "subcategory_key")
+        )
+        resolved = self.filter_insertable_expenses(
+            categorized.filter(pl.col("subcategory_id").is_not_null())
+        )
+        unresolved = categorized.filter(pl.col("subcategory_id").is_null()).select(
+            df.columns
+        )
+        return (resolved, unresolved)
+
     def insert_expense(
         self,
         date: date,
@@ -75,8 +196,6 @@ class MyFinanceDB(FinanceDB):
         cc_category: str | None = None,
     ) -> None:
         print(f"Transaction on {date} at {merchant} for {cost}")
-        category = None
-        subcategory = None
         # try auto match
         found_match = False
         if card_type == "rogers" and cc_category is not None:
@@ -95,32 +214,16 @@ class MyFinanceDB(FinanceDB):
             found_match = True
             category, subcategory = ref_category_tuple
             print(f"Ref Category: {category}, Ref Subcategory: {subcategory}")
-            subcategory_id = self.get_subcategory_id_from_name(subcategory)
+            subcategory_id = self.get_subcategory_id_from_name(subcategory, category)
             category_id = self.get_category_id_from_subcategory_id(subcategory_id)
         # else user input
         else:
-            df = self.get_subcategory_and_category()
-            print("\n\n")
-            print(df)
-            print("\n\n")
-            valid_ids = df.get_column("subcategory_id").to_list()
-            while True:
-                subcategory_id = input("Enter the subcategory id: ")
-                print(subcategory_id)
-                if lower(subcategory_id) == "skip":
-                    print("Skipping...")
-                    return
-                try:
-                    subcategory_id = int(subcategory_id)
-                    if subcategory_id not in valid_ids:
-                        print(
-                            "Invalid subcategory id. Please enter a valid id from the list above."
-                        )
-                        continue
-                    break
-                except ValueError:
-                    print("Invalid input. Please enter a valid integer.")
-            category_id = self.get_category_id_from_subcategory_id(subcategory_id)
+            expense_ids = self.ask_for_category()
+            if expense_ids is None:
+                self.skipped_expense_count += 1
+                return
+            category_id = expense_ids["category_id"]
+            subcategory_id = expense_ids["subcategory_id"]
         # if subcategory is reimbursement or if in reimbursement_merchant_ref, need to double check if record already exists (date, merchant only)
         if (
             any(
@@ -133,54 +236,67 @@ class MyFinanceDB(FinanceDB):
                 print(f"Record already exists for {date} at {merchant}. Skipping...")
                 return
         # insert the expense
-        query = "insert into expenses (date, merchant, cost, category_id, subcategory_id) values (%s, %s, %s, %s, %s)"
+        query = "insert into expenses (date, merchant, cost, category_id, subcategory_id) values (%s, %s, %s, %s, %s) on conflict (date, merchant, cost) do nothing"
         self.insert(query, (date, merchant, cost, category_id, subcategory_id))
         # ask the user if they want to add the merchant to the auto_match table
         if not found_match:
             # if merchant is "Interac e-Transfer® Out", skip
-            if merchant == "Interac e-Transfer® Out":
+            if merchant in self.auto_match_excluded_merchants:
                 return
-            while True:
-                add_to_auto_match = input("Add to auto_match table? (y/n): ")
-                if add_to_auto_match == "y":
-                    # check if category and subcategory are not None, if they are None, get the names from the database
-                    if category is None or subcategory is None:
-                        category, subcategory = (
-                            self.get_category_and_subcategory_name_from_subcategory_id(
-                                subcategory_id
-                            )
-                        )
-                    self.insert_into_auto_match(merchant, category, subcategory)
-                    break
-                elif add_to_auto_match == "n":
-                    break
-                else:
-                    print("Please enter a valid response (y/n).")
+            if self.confirm_add_to_auto_match():
+                self.insert_into_auto_match(
+                    merchant, *self.get_auto_match_labels(expense_ids)
+                )
+
+    def ask_for_category(self) -> dict[str, int] | None:
+        """
+        Ask the user to select a subcategory.
+        Returns the category and subcategory ids, or None if the user skips.
+        """
+        df = self.get_subcategory_and_category()
+        print("\n\n")
+        print(df)
+        print("\n\n")
+        valid_ids = df.get_column("subcategory_id").to_list()
+        while True:
+            subcategory_id = input("Enter the subcategory id: ")
+            print(subcategory_id)
+            if lower(subcategory_id) == "skip":
+                print("Skipping...")
+                return None
+            try:
+                subcategory_id = int(subcategory_id)
+                if subcategory_id not in valid_ids:
+                    print(
+                        "Invalid subcategory id. Please enter a valid id from the list above."
+                    )
+                    continue
+                break
+            except ValueError:
+                print("Invalid input. Please enter a valid integer.")
+        return {
+            "category_id": self.get_category_id_from_subcategory_id(subcategory_id),
+            "subcategory_id": subcategory_id,
+        }
+
+    def get_auto_match_labels(self, expense_ids: dict[str, int]) -> tuple[str, str]:
+        """
+        Get the (category, subcategory) names to store in the auto_match table.
+        """
+        return self.get_category_and_subcategory_name_from_subcategory_id(
+            expense_ids["subcategory_id"]
+        )
 
     def get_auto_match_category(self, merchant: str) -> tuple[str, str] | None:
         """
         Get the category and subcategory for the merchant.
         """
-        query = "select merchant_category, merchant_subcategory from merchant_name_auto_match where merchant_name = %s"
-        result = self.select(query, (merchant,))
-        if len(result) > 1:
-            raise ValueError(
-                f"Multiple categories found for {merchant}. Something is wrong."
-            )
-        elif len(result) == 1:
-            return result[0]
+        result = self.get_exact_auto_match(merchant)
+        if result is not None:
+            return result
         else:
             # try substring auto match
-            query = "select substring, merchant_category, merchant_subcategory from substring_auto_match"
-            result = self.select(query)
-            substring_matches = list()
-            for item in result:
-                if item[0] in merchant.lower():
-                    substring_matches.append((item[1], item[2]))
-            if len(substring_matches) >= 1:
-                return substring_matches[0]
-            else:
-                return None
+            return self.substring_matcher.match(merchant)
 
     def insert_into_auto_match(
         self, merchant: str, category: str, subcategory: str
@@ -188,5 +304,4 @@ class MyFinanceDB(FinanceDB):
         """
         Insert a new merchant into the auto_match table.
         """
-        query = "insert into merchant_name_auto_match (merchant_name, merchant_category, merchant_subcategory) values (%s, %s, %s)"
-        self.insert(query, (merchant, category, subcategory))
+        self._insert_auto_match(merchant, category, subcategory)
@@ -3,9 +3,11 @@ from datetime import date
 import polars as pl
 
 from db.finance_base import FinanceDB
+from db.reference_data import normalize_name, normalize_name_expr
 
 
 class ParentsFinanceDB(FinanceDB):
+    auto_match_table = "auto_match"
     cron: bool
     manual_intervention_required_expense_count: int = 0
 
@@ -17,41 +19,81 @@ class ParentsFinanceDB(FinanceDB):
         """
         Get all categories.
         """
-        query = "select id, name as category from categories"
-        return pl.DataFrame(
-            self.select(query),
-            schema={"id": pl.Int64, "category": pl.Utf8},
-            orient="row",
-        ).sort("category")
+        return self.reference_data.categories_df
 
     def get_category_name_from_id(self, category_id: int) -> str:
         """
         Get the category name from the category id.
         """
-        query = "select name as category from categories where id = %s"
-        return self.select(query, (category_id,))[0][0]
+        return self.reference_data.category_names[category_id]
 
     def get_category_id_from_name(self, category_name: str) -> int:
         """
         Get the category id from the category name.
+        Matching ignores case and non-breaking spaces from CSV exports.
         """
         if category_name is None:
             return None
+        return self.reference_data.get_category_id(category_name)
 
-        # Normalize whitespace from CSV exports (notably non-breaking spaces).
-        category_name = category_name.replace("\xa0", " ").strip()
-
-        query = "select id from categories where lower(name) = lower(%s)"
-        result = self.select(query, (category_name,))
-        if len(result) == 1:
-            return result[0][0]
-        elif len(result) > 1:
-            print(f"Multiple categories found for {category_name}. Something is wrong.")
-            raise ValueError(
-                f"Multiple categories found for {category_name}. Something is wrong."
+    def categorize_expenses(
+        self, df: pl.DataFrame, card_type: str = ""
+    ) -> tuple[pl.DataFrame, pl.DataFrame]:
+        """
+        Categorize a whole statement at once without asking the user.
+
+        Rules are applied in the same order as `insert_expense`: the cc_category
+        name, then the exact merchant name auto-match table, then the substring
+        rules. Rows resolved to the "Ignore" category are dropped.
+
+        Returns:
+            Tuple of (resolved, unresolved) rows
+        """
+        category_keys = self.reference_data.category_keys_df
+        matches = self._match_auto_match_rules(df.get_column("merchant"))
+        categorized = (
+            pl.concat([df, matches], how="horizontal")
+            .with_columns(
+                normalize_name_expr(pl.col("cc_category").cast(pl.Utf8)).alias(
+                    "cc_category_key"
+                ),
+                normalize_name_expr(pl.col("merchant_category")).alias("category_key"),
             )
-        else:
-            return None
+            .join(
+                category_keys.rename(
+                    {"category_key": "cc_category_key", "category_id": "cc_category_id"}
+                ),
+                on="cc_category_key",
+                how="left",
+                maintain_order="left",
+            )
+            .join(category_keys, on="category_key", how="left", maintain_order="left")
+            .with_columns(
+                pl.coalesce("cc_category_id", "category_id").alias("category_id")
+            )
+            .drop("cc_category_key", "category_key", "cc_category_id")
+        )
+        resolved = self.filter_insertable_expenses(
+            categorized.filter(pl.col("category_id").is_not_null())
+        )
+        unresolved = categorized.filter(pl.col("category_id").is_null()).select(
+            df.columns
+        )
+        return (resolved, unresolved)
+
+    def filter_insertable_expenses(self, df: pl.DataFrame) -> pl.DataFrame:
+        """
+        Drop rows whose category is explicitly named "Ignore".
+        """
+        ignore_ids = [
+            category_id
+            for category_id, name in self.reference_data.category_names.items()
+            if normalize_name(name) == "ignore"
+        ]
+        ignored = df.filter(pl.col("category_id").is_in(ignore_ids))
+        for merchant in ignored.get_column("merchant"):
+            print(f"Skipping insert for {merchant}: category is configured as ignore.")
+        return df.filter(~pl.col("category_id").is_in(ignore_ids))
 
     def insert_expense(
         self,
@@ -88,23 +130,11 @@ class ParentsFinanceDB(FinanceDB):
                 self.manual_intervention_required_expense_count += 1
                 return 1
             # Ask user to select category
-            df = self.get_category()
-            print(df)
-            while True:
-                category_id = input("Enter the category id: ")
-                if category_id.strip().lower() == "skip":
-                    print("Skipping...")
-                    return 0
-                try:
-                    category_id = int(category_id)
-                    if category_id in df["id"].to_list():
-                        break
-                    else:
-                        print(
-                            f"Category ID {category_id} not found. Please enter a valid category ID."
-                        )
-                except ValueError:
-                    print("Please enter a valid integer for category ID.")
+            expense_ids = self.ask_for_category()
+            if expense_ids is None:
+                self.skipped_expense_count += 1
+                return 0
+            category_id = expense_ids["category_id"]
         # Skip inserts only when the resolved category is explicitly named "Ignore".
         # Category IDs are database-specific and can drift, so hardcoding an ID (22)
         # causes real categories (e.g. Utilities) to be skipped in parents_finance.
@@ -114,52 +144,56 @@ class ParentsFinanceDB(FinanceDB):
                 f"Skipping insert for {merchant}: category '{category_name}' is configured as ignore."
             )
         else:
-            query = "insert into expenses (date, merchant, cost, category_id) values (%s, %s, %s, %s)"
+            query = "insert into expenses (date, merchant, cost, category_id) values (%s, %s, %s, %s) on conflict (date, merchant, cost) do nothing"
             self.insert(query, (date, merchant, cost, category_id))
 
         # ask the user if they want to add the merchant to the auto_match table
-        if not found_match:
-            while True:
-                add_to_auto_match = input("Add to auto_match table? (y/n): ")
-                if add_to_auto_match == "y":
-                    self.insert_into_auto_match(
-                        merchant, self.get_category_name_from_id(category_id)
-                    )
-                    break
-                elif add_to_auto_match == "n":
-                    break
-                else:
-                    print("Please enter a valid response (y/n).")
+        if not found_match and self.confirm_add_to_auto_match():
+            self.insert_into_auto_match(
+                merchant, *self.get_auto_match_labels({"category_id": category_id})
+            )
         return 0
 
+    def ask_for_category(self) -> dict[str, int] | None:
+        """
+        Ask the user to select a category.
+        Returns the category id, or None if the user skips.
+        """
+        df = self.get_category()
+        print(df)
+        while True:
+            category_id = input("Enter the category id: ")
+            if category_id.strip().lower() == "skip":
+                print("Skipping...")
+                return None
+            try:
+                category_id = int(category_id)
+                if category_id in df["id"].to_list():
+                    return {"category_id": category_id}
+                else:
+                    print(
+                        f"Category ID {category_id} not found. Please enter a valid category ID."
+                    )
+            except ValueError:
+                print("Please enter a valid integer for category ID.")
+
+    def get_auto_match_labels(self, expense_ids: dict[str, int]) -> tuple[str]:
+        """
+        Get the category name to store in the auto_match table.
+        """
+        return (self.get_category_name_from_id(expense_ids["category_id"]),)
+
     def get_auto_match_category(self, merchant_name: str) -> str | None:
         """
         Get the category for the merchant.
         """
-        query = "select merchant_category from auto_match where merchant_name = %s"
-        result = self.select(query, (merchant_name,))
-        if len(result) > 1:
-            raise ValueError(
-                f"Multiple categories found for {merchant_name}. Something is wrong."
-            )
-        elif len(result) == 1:
-            return result[0][0]
+        result = self.get_exact_auto_match(merchant_name)
+        if result is not None:
+            return result[0]
         else:
             # try substring auto match
-            query = "select substring, merchant_category from substring_auto_match"
-            result = self.select(query)
-            substring_matches = list()
-            for item in result:
-                if item[0] in merchant_name.lower():
-                    substring_matches.append(item[1])
-            if len(substring_matches) > 1:
-                raise ValueError(
-                    f"Multiple categories found for {merchant_name}. Something is wrong."
-                )
-            elif len(substring_matches) == 1:
-                return substring_matches[0]
-            else:
-                return None
+            substring_match = self.substring_matcher.match(merchant_name)
+            return substring_match[0] if substring_match else None
 
     def insert_into_auto_match(
         self, merchant_name: str, merchant_category: str
@@ -167,7 +201,28 @@ class ParentsFinanceDB(FinanceDB):
         """
         Insert a new merchant into the auto_match table.
         """
+        self._insert_auto_match(merchant_name, merchant_category)
+
+    def get_high_water_mark(self, source: str) -> tuple[int, date, str] | None:
+        """
+        Get (row_count, last_date, prefix_hash) of the rows of a workbook already
+        processed, or None if it was never loaded incrementally.
+        """
+        query = "select row_count, last_date, prefix_hash from excel_high_water_mark where source = %s"
+        result = self.select(query, (source,))
+        return result[0] if result else None
+
+    def set_high_water_mark(
+        self, source: str, row_count: int, last_date: date | None, prefix_hash: str
+    ) -> None:
+        """
+        Record how far a workbook has been processed.
+        """
         query = (
-            "insert into auto_match (merchant_name, merchant_category) values (%s, %s)"
+            "insert into excel_high_water_mark (source, row_count, last_date, prefix_hash) "
+            "values (%s, %s, %s, %s) "
+            "on conflict (source) do update set row_count = excluded.row_count, "
+            "last_date = excluded.last_date, prefix_hash = excluded.prefix_hash, "
+            "updated_at = now()"
         )
-        self.insert(query, (merchant_name, merchant_category))
+        self.insert(query, (source, row_count, last_date, prefix_hash))
@@ -0,0 +1,142 @@
+"""
+Reference Data - In-memory copy of the category and subcategory tables.
+
+The categories and subcategories tables are tiny and almost never change, so
+they are loaded once per run and shared by every lookup instead of being
+queried for each transaction.
+"""
+
+import polars as pl
+
+
+def normalize_name(name: str) -> str:
+    """
+    Normalize a category or subcategory name for lookups.
+    Case-insensitive and tolerant of non-breaking spaces from CSV exports.
+    """
+    return name.replace("\xa0", " ").strip().lower()
+
+
+def normalize_name_expr(expr: pl.Expr) -> pl.Expr:
+    """
+    Vectorized version of `normalize_name` for polars columns.
+    """
+    return expr.str.replace_all("\xa0", " ").str.strip_chars().str.to_lowercase()
+
+
+class ReferenceData:
+    """
+    Lookup maps over the categories and (optionally) subcategories tables.
+    """
+
+    def __init__(
+        self,
+        categories: list[tuple[int, str]],
+        subcategories: list[tuple[int, str, int]],
+    ):
+        """
+        Build the lookup maps.
+
+        Args:
+            categories: (id, name) rows of the categories table
+            subcategories: (id, name, category_id) rows of the subcategories table
+        """
+        self.category_names: dict[int, str] = {}
+        self.category_ids: dict[str, list[int]] = {}
+        for category_id, name in sorted(categories):
+            self.category_names[category_id] = name
+            self.category_ids.setdefault(normalize_name(name), []).append(category_id)
+
+        self.subcategory_names: dict[int, str] = {}
+        self.subcategory_category_ids: dict[int, int] = {}
+        self.subcategory_ids: dict[str, list[int]] = {}
+        self.subcategory_ids_by_category: dict[tuple[str, str], int] = {}
+        for subcategory_id, name, category_id in sorted(subcategories):
+            self.subcategory_names[subcategory_id] = name
+            self.subcategory_category_ids[subcategory_id] = category_id
+            self.subcategory_ids.setdefault(normalize_name(name), []).append(
+                subcategory_id
+            )
+            category_key = normalize_name(self.category_names[category_id])
+            self.subcategory_ids_by_category.setdefault(
+                (category_key, normalize_name(name)), subcategory_id
+            )
+
+        # pre-sorted tables shown to the user when asking for a category
+        self.categories_df = pl.DataFrame(
+            [(category_id, name) for category_id, name in self.category_names.items()],
+            schema={"id": pl.Int64, "category": pl.Utf8},
+            orient="row",
+        ).sort("category")
+        self.subcategories_df = pl.DataFrame(
+            [
+                (
+                    subcategory_id,
+                    name,
+                    self.category_names[self.subcategory_category_ids[subcategory_id]],
+                )
+                for subcategory_id, name in self.subcategory_names.items()
+            ],
+            schema={
+                "subcategory_id": pl.Int64,
+                "subcategory": pl.Utf8,
+                "category": pl.Utf8,
+            },
+            orient="row",
+        ).sort(by=["category", "subcategory"])
+
+        # normalized name keys for joining against whole statements
+        self.category_keys_df = pl.DataFrame(
+            [
+                (key, category_ids[0])
+                for key, category_ids in self.category_ids.items()
+                if len(category_ids) == 1
+            ],
+            schema={"category_key": pl.Utf8, "category_id": pl.Int64},
+            orient="row",
+        )
+        self.subcategory_keys_df = pl.DataFrame(
+            [
+                (*key, subcategory_id)
+                for key, subcategory_id in self.subcategory_ids_by_category.items()
+            ],
+            schema={
+                "category_key": pl.Utf8,
+                "subcategory_key": pl.Utf8,
+                "subcategory_id": pl.Int64,
+            },
+            orient="row",
+        ).with_columns(
+            pl.col("subcategory_id")
+            .replace_strict(self.subcategory_category_ids, return_dtype=pl.Int64)
+            .alias("category_id")
+        )
+
+    def get_category_id(self, category_name: str) -> int | None:
+        """
+        Get the category id for a name, or None if there is no such category.
+
+        Raises:
+            ValueError: If several categories share the normalized name
+        """
+        category_ids = self.category_ids.get(normalize_name(category_name), [])
+        if len(category_ids) > 1:
+            raise ValueError(
+                f"Multiple categories found for {category_name}. Something is wrong."
+            )
+        return category_ids[0] if category_ids else None
+
+    def get_subcategory_id(
+        self, subcategory_name: str, category_name: str | None = None
+    ) -> int | None:
+        """
+        Get the subcategory id for a name, or None if there is no such subcategory.
+        Subcategory names are only unique within a category, so pass the category
+        name when it is known.
+        """
+        if category_name is not None:
+            key = (normalize_name(category_name), normalize_name(subcategory_name))
+            if key in self.subcategory_ids_by_category:
+                return self.subcategory_ids_by_category[key]
+        subcategory_ids = self.subcategory_ids.get(normalize_name(subcategory_name))
+        return subcategory_ids[0] if subcategory_ids else None
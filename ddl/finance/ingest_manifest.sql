@@ -0,0 +1,14 @@
+CREATE TABLE ingest_manifest (
+    id serial NOT NULL,
+    file_name text NOT NULL,
+    content_hash text NOT NULL,
+    size bigint NOT NULL,
+    card_type text NOT NULL,
+    row_count integer NOT NULL,
+    run_id text NOT NULL,
+    ingested_at timestamp NOT NULL DEFAULT now(),
+    CONSTRAINT ingest_manifest_pkey PRIMARY KEY (id),
+    CONSTRAINT ingest_manifest_card_type_content_hash_key UNIQUE (card_type, content_hash)
+    -- One row per statement file loaded by load-transactions.py
+    -- Files with a known content hash are skipped, files extending a known file only load the new rows
+);
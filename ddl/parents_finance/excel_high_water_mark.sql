@@ -0,0 +1,10 @@
+CREATE TABLE excel_high_water_mark (
+    source text NOT NULL,
+    row_count integer NOT NULL,
+    last_date date,
+    prefix_hash text NOT NULL,
+    updated_at timestamp NOT NULL DEFAULT now(),
+    CONSTRAINT excel_high_water_mark_pkey PRIMARY KEY (source)
+    -- One row per workbook loaded by load-excel-transactions.py --incremental
+    -- Rows up to row_count are skipped while the digest of that prefix is unchanged
+);
@@ -0,0 +1,8 @@
+CREATE TABLE sync_state (
+    source text NOT NULL,
+    last_date date NOT NULL,
+    updated_at timestamp NOT NULL DEFAULT now(),
+    CONSTRAINT sync_state_pkey PRIMARY KEY (source)
+    -- One row per online source (e.g. ws_debit) loaded by load-transactions.py
+    -- Later syncs only fetch activity from a few days before last_date onward
+);
@@ -1,69 +1,68 @@
-import urllib
 import argparse
+import hashlib
 import os
 import re
-import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
 
 import polars as pl
 import requests
 
 from db.parents_finance import ParentsFinanceDB
+from sources.ref_data import skip_rules_ref
+from utils.excel_cache import ExcelCache
+from utils.ftp_fetcher import FtpFetcher
+from utils.skip_rules import SkipRules
 
 RPI_IP = "10.20.0.8"
 DISCORD_ALERT_BOT_URL = f"http://{RPI_IP}:30007/alert"
 DEBUG = True
+# number of FTP files downloaded at the same time
+DOWNLOAD_JOBS = 3
 
-# Keywords in cc_sub_category that trigger transaction skipping/deletion
-SKIP_KEYWORDS = [
-    "Tfr=",  # Transfer transactions to delete if they exist
-    "TFR-TO",
-]
-
-# Keywords specific to chequing files that should be skipped
-CHEQUING_SKIP_KEYWORDS = [
-    "Tfr-",  # Transfers in chequing accounts
-    "TFR-TO",
-]
-
-# Keywords in merchant name that trigger transaction skipping
-MERCHANT_SKIP_KEYWORDS = [
-    "LOAN PAYMENT",  # Add merchant keywords here, e.g., "TRANSFER", "PAYMENT"
-    "IG FIN SER SFGI  INV",
-    "IG FIN SER SFGI INV",
-    "WH000 TFR-TO 4109633",  # td account transfers
-    "WH005 TFR-TO 4116036",
-    "WH055 TFR-TO C/C",  # chequing account transfers to credit card
-]
-
-
-def run(file_path: str, cron: bool, original_file_path: str):
-    # chequing file check
+# transfers that are deleted if they were loaded before
+TRANSFER_RULES = SkipRules("excel_transfer", skip_rules_ref["excel_transfer"])
+# transfers specific to chequing files
+CHEQUING_SKIP_RULES = SkipRules("excel_chequing", skip_rules_ref["excel_chequing"])
+# merchants that are never loaded
+MERCHANT_SKIP_RULES = SkipRules("excel_merchant", skip_rules_ref["excel_merchant"])
+
+
+def run(
+    file_path: str | BytesIO,
+    original_file_path: str,
+    parents_db: ParentsFinanceDB,
+    incremental: bool = False,
+) -> list[str]:
+    """
+    Load a single workbook, returning the lines of its report.
+
+    Args:
+        file_path: Local path of the workbook, or its downloaded contents
+        original_file_path: Path or FTP URL the workbook came from
+        parents_db: Database the rows are loaded into
+        incremental: Skip the rows processed by the last incremental run
+    """
+    # chequing file check, on the original name since downloads have none
     chequing_file = False
-    if "tdcheq" in file_path.lower():
+    if "tdcheq" in original_file_path.lower():
         chequing_file = True
 
-    # Define schema for the Excel file
+    # Define schema for the columns we need
     schema = {
-        "BANK": pl.Utf8,
-        "YEAR": pl.Int64,
         "DATE": pl.Date,
         "DETAILSDescriptions": pl.Utf8,
         "DR_PAYMENTs": pl.Float64,
-        "CR_RECEIPT": pl.Float64,
         "ACCT_subCODE": pl.Utf8,
         "ACCT_CODE": pl.Utf8,
     }
 
-    # Read Excel file with defined schema
-    df = pl.read_excel(file_path, schema_overrides=schema)
-
-    # select only the columns we need
-    df1 = df.select(
-        pl.col("DATE"),
-        pl.col("DETAILSDescriptions"),
-        pl.col("DR_PAYMENTs"),
-        pl.col("ACCT_subCODE"),
-        pl.col("ACCT_CODE"),
+    # Read only the columns we need, reusing the decoded sheet of an unchanged
+    # workbook from the cache
+    df1 = (
+        ExcelCache()
+        .read_excel(file_path, columns=list(schema), schema_overrides=schema)
+        .collect()
     )
 
     # rename the columns
@@ -77,57 +76,207 @@ def run(file_path: str, cron: bool, original_file_path: str):
         }
     )
 
+    # in incremental mode, skip the rows processed by the last run if they are unchanged
+    source = os.path.basename(original_file_path)
+    processed_rows = 0
+    if incremental:
+        processed_rows = get_processed_rows(df2, source, parents_db)
+
     # drop rows where cost is negative
-    df3 = df2.filter(pl.col("cost") > 0)
-
-    # load parents db
-    parents_db = ParentsFinanceDB(debug=DEBUG, cron=cron)
-
-    # insert the expenses
-    new_inserted_rows = 0
-    for i, row in enumerate(df3.iter_rows(named=True)):
-        print(f"Processing row {i + 1}/{df3.height}")
-        date = row["date"]
-        merchant = row["merchant"]
-        cost = row["cost"]
-        cc_category = row["cc_category"]
-        cc_sub_category = row["cc_sub_category"]
-        # special handling for skip keywords - delete if exists and skip
-        if any(keyword in cc_sub_category for keyword in SKIP_KEYWORDS):
-            # check if transaction already exists in expenses table
-            if parents_db.check_if_expense_exists(date, merchant, cost):
-                # if yes, delete from expenses table
-                expense_id = parents_db.get_expense_id(date, merchant, cost)
-                parents_db.delete_expense(expense_id)
-            continue
-        # if chequing file, skip transactions with chequing-specific keywords
-        if chequing_file and any(
-            keyword in cc_sub_category for keyword in CHEQUING_SKIP_KEYWORDS
+    df3 = df2.slice(processed_rows).filter(pl.col("cost") > 0)
+
+    # load the new rows in a single transaction
+    manual_intervention_count = parents_db.manual_intervention_required_expense_count
+    skipped_count = parents_db.skipped_expense_count
+    with parents_db.transaction():
+        new_inserted_rows = insert_rows(df3, chequing_file, parents_db)
+        # rows waiting for manual intervention or skipped at the prompt are
+        # retried by the next run
+        if (
+            incremental
+            and parents_db.manual_intervention_required_expense_count
+            == manual_intervention_count
+            and parents_db.skipped_expense_count == skipped_count
         ):
-            continue
-        # skip transactions with merchant skip keywords
-        if any(keyword in merchant for keyword in MERCHANT_SKIP_KEYWORDS):
-            continue
-        # Check if transaction already exists in expenses table
-        if not parents_db.check_if_expense_exists(date, merchant, cost):
-            print("\n\n")
-            print("New transaction found")
-            return_value = parents_db.insert_expense(date, merchant, cost, cc_category)
-            if return_value == 0:
-                new_inserted_rows += 1
+            parents_db.set_high_water_mark(
+                source,
+                df2.height,
+                df2.get_column("date").last() if df2.height else None,
+                prefix_digest(df2),
+            )
 
     print("\n\n")
-    if cron:
-        send_discord_message(
-            f"Successfully inserted {new_inserted_rows}/{df3.height} rows into parents_finance.expenses for {original_file_path}"
+    report = [
+        f"Successfully inserted {new_inserted_rows}/{df3.height} rows into parents_finance.expenses for {original_file_path}"
+    ]
+    manual_intervention_count = (
+        parents_db.manual_intervention_required_expense_count
+        - manual_intervention_count
+    )
+    if manual_intervention_count > 0:
+        report.append(
+            f"Manual intervention required for {manual_intervention_count} expenses for {original_file_path}"
         )
-        if parents_db.manual_intervention_required_expense_count > 0:
-            message = f"Manual intervention required for {parents_db.manual_intervention_required_expense_count} expenses for {original_file_path}"
-            send_discord_message(message)
+    return report
+
+
+def run_batch(
+    file_paths: list[str],
+    cron: bool,
+    incremental: bool,
+    download_jobs: int,
+    force: bool = False,
+) -> int:
+    """
+    Load several workbooks in one process, sending a single report at the end.
+
+    FTP files are downloaded into memory in the background, at most
+    `download_jobs` at a time over reused FTP sessions, while the workbooks are
+    loaded one at a time in order with a shared database connection pool. FTP
+    files whose size and modification time did not change since they were last
+    loaded are skipped without being downloaded, unless `force` is set.
+
+    Returns:
+        int: Number of workbooks that failed to load
+    """
+    report = []
+    failures = 0
+    fetcher = FtpFetcher(force=force)
+    try:
+        with ThreadPoolExecutor(max_workers=download_jobs) as executor:
+            downloads = [
+                executor.submit(fetcher.fetch, file_path)
+                if file_path.startswith("ftp://")
+                else None
+                for file_path in file_paths
+            ]
+            with ParentsFinanceDB(debug=DEBUG, cron=cron) as parents_db:
+                for file_path, download in zip(file_paths, downloads):
+                    try:
+                        if download is None:
+                            report.extend(
+                                run(file_path, file_path, parents_db, incremental)
+                            )
+                            continue
+                        fetched = download.result()
+                        if fetched is None:
+                            report.append(
+                                f"Unchanged since it was last loaded, skipped {file_path}"
+                            )
+                            continue
+                        data, stamp = fetched
+                        manual_intervention_count = (
+                            parents_db.manual_intervention_required_expense_count
+                        )
+                        skipped_count = parents_db.skipped_expense_count
+                        report.extend(run(data, file_path, parents_db, incremental))
+                        # files waiting for manual intervention or with rows skipped
+                        # at the prompt are retried by the next run
+                        if (
+                            parents_db.manual_intervention_required_expense_count
+                            == manual_intervention_count
+                            and parents_db.skipped_expense_count == skipped_count
+                        ):
+                            fetcher.mark_loaded(file_path, stamp)
+                    except KeyboardInterrupt:
+                        raise
+                    except Exception as e:
+                        failures += 1
+                        report.append(f"Error for {file_path}: {e}")
+    finally:
+        fetcher.close()
+        # the workbooks are already loaded, so report a failed save with them
+        try:
+            fetcher.save()
+        except Exception as e:
+            failures += 1
+            report.append(f"Error saving the FTP state to {fetcher.state_path}: {e}")
+
+    if cron:
+        send_discord_message("\n".join(report))
     else:
-        print(
-            f"Successfully inserted {new_inserted_rows}/{df3.height} rows into parents_finance.expenses for {original_file_path}"
+        print("\n".join(report))
+    return failures
+
+
+def prefix_digest(df: pl.DataFrame) -> str:
+    """
+    Digest of the contents of a workbook's rows, used to detect edits to rows that
+    were already processed.
+    """
+    return hashlib.sha256(df.write_csv().encode()).hexdigest()
+
+
+def get_processed_rows(
+    df: pl.DataFrame, source: str, parents_db: ParentsFinanceDB
+) -> int:
+    """
+    Get the number of leading rows of a workbook that the last incremental run
+    already processed.
+
+    Returns 0, so the whole workbook is reconciled, if the workbook was never
+    loaded incrementally or if any of the processed rows changed since.
+    """
+    high_water_mark = parents_db.get_high_water_mark(source)
+    if high_water_mark is None:
+        print(f"No high-water mark for {source}, processing every row")
+        return 0
+    row_count, last_date, prefix_hash = high_water_mark
+    if row_count > df.height or prefix_digest(df.head(row_count)) != prefix_hash:
+        print(f"Processed rows of {source} changed, processing every row")
+        return 0
+    print(
+        f"Skipping {row_count} rows of {source} processed up to {last_date}, "
+        f"{df.height - row_count} new rows"
+    )
+    return row_count
+
+
+def insert_rows(
+    df: pl.DataFrame, chequing_file: bool, parents_db: ParentsFinanceDB
+) -> int:
+    """
+    Insert the new expenses of a workbook, returning the number of rows inserted.
+
+    The skip rules are evaluated for the whole workbook at once, so the database
+    work for deletes and inserts is batched instead of paying a round trip per row.
+    """
+    # transfers are deleted if they were loaded before, in one pipelined batch
+    transfers = TRANSFER_RULES.match(df)
+    deleted_rows = parents_db.delete_expenses_if_exist(df.filter(transfers))
+    print(f"Deleted {deleted_rows}/{transfers.sum()} transfer transactions")
+
+    # skip the other excluded transactions
+    skipped = transfers | MERCHANT_SKIP_RULES.match(df)
+    if chequing_file:
+        skipped = skipped | CHEQUING_SKIP_RULES.match(df)
+
+    # find the rows not yet in the expenses table in a single round trip
+    new_df = parents_db.filter_new_expenses(df.filter(~skipped))
+
+    # categorize every new transaction at once and bulk insert the resolved ones.
+    # cc_category is left out, matching the lookups insert_expense does for rows
+    # of this workbook.
+    resolved, unresolved = parents_db.categorize_expenses(
+        new_df.with_columns(pl.lit(None, dtype=pl.Utf8).alias("cc_category"))
+    )
+    if resolved.height > 0:
+        print("\n\n")
+        print(f"Auto-categorized {resolved.height} new transactions")
+        print(resolved)
+    new_inserted_rows, _ = parents_db.bulk_insert_expenses(resolved)
+
+    # ask the user about the rest
+    for row in unresolved.iter_rows(named=True):
+        print("\n\n")
+        print("New transaction found")
+        return_value = parents_db.insert_expense(
+            row["date"], row["merchant"], row["cost"]
         )
+        if return_value == 0:
+            new_inserted_rows += 1
+
+    return new_inserted_rows
 
 
 def obscure_credentials(message):
@@ -140,54 +289,78 @@ def send_discord_message(message):
     requests.post(DISCORD_ALERT_BOT_URL, json=payload_dict)
 
 
-def fetch_ftp_file(ftp_url: str) -> str:
+def read_file_list(file_list_path: str) -> list[str]:
     """
-    Downloads a file from the given FTP URL to a temporary local file.
-
-    Args:
-        ftp_url (str): The FTP URL of the file to download.
-
-    Returns:
-        str: The path to the downloaded local temporary file.
+    Read the workbooks listed in a file, one path or FTP URL per line.
+    Blank lines and lines starting with # are ignored, and environment variables
+    (e.g. FTP credentials) are expanded.
     """
-    tmp_file = tempfile.NamedTemporaryFile(delete=False)
-    print(f"Downloading {ftp_url} to {tmp_file.name}...")
-    urllib.request.urlretrieve(ftp_url, tmp_file.name)
-    tmp_file.close()
-    return tmp_file.name
+    with open(file_list_path) as f:
+        lines = [line.strip() for line in f]
+    return [
+        os.path.expandvars(line) for line in lines if line and not line.startswith("#")
+    ]
 
 
 if __name__ == "__main__":
     # Set up argument parser
     parser = argparse.ArgumentParser(
-        description="Load credit card data into PostgreSQL database from pre-existing excel file"
+        description="Load credit card data into PostgreSQL database from pre-existing excel files"
+    )
+    parser.add_argument(
+        "--filepath",
+        nargs="+",
+        default=[],
+        help="Paths or ftp:// URLs of the credit card excel files",
     )
     parser.add_argument(
-        "--filepath", required=True, help="Path to the credit card excel file"
+        "--file-list",
+        required=False,
+        help="Path to a file listing one excel file path or ftp:// URL per line",
     )
     parser.add_argument(
         "--cron", required=False, help="boolean, any input will trigger true"
     )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only process the rows added since the last incremental run, "
+        "reprocessing the whole file if earlier rows changed",
+    )
+    parser.add_argument(
+        "--download-jobs",
+        type=int,
+        default=DOWNLOAD_JOBS,
+        help="Number of FTP files downloaded at the same time",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="download and load FTP files even if they are unchanged since they "
+        "were last loaded",
+    )
     args = parser.parse_args()
-    file_path = args.filepath
+    file_paths = args.filepath
+    if args.file_list:
+        file_paths = file_paths + read_file_list(args.file_list)
+    if not file_paths:
+        parser.error("provide --filepath or --file-list")
+    if args.download_jobs < 1:
+        parser.error("--download-jobs must be at least 1")
     cron = True if args.cron else False
 
-    if file_path.startswith("ftp://"):
-        local_file_path = fetch_ftp_file(file_path)
-    else:
-        local_file_path = file_path
-
     try:
-        run(local_file_path, cron, file_path)
+        failures = run_batch(
+            file_paths, cron, args.incremental, args.download_jobs, args.force
+        )
     except KeyboardInterrupt:
         print("Keyboard interrupt")
         exit()
     except Exception as e:
         if cron:
-            send_discord_message(f"Error for {file_path}: {e}")
+            send_discord_message(f"Error loading {len(file_paths)} files: {e}")
         else:
-            print(f"Error for {file_path}: {e}")
-        exit()
-    finally:
-        if local_file_path != file_path:
-            os.remove(local_file_path)
+            print(f"Error loading {len(file_paths)} files: {e}")
+        exit(1)
+    if failures:
+        exit(1)
@@ -5,7 +5,8 @@ This script loads credit card transaction data from various sources
 into a PostgreSQL database with automatic categorization.
 
 Usage:
-    python load-transactions.py --type <card_type> [--filepath <file> | --folder <dir>] [--database <db>]
+    python load-transactions.py --type <card_type> [<card_type> ...] [--filepath <file> | --folder <dir>] [--database <db>]
+    python load-transactions.py --type all --plan <plan.json> [--database <db>]
 
 Examples:
     # Single file
@@ -17,6 +18,9 @@ Examples:
     # Online source
     python load-transactions.py --type ws_debit
 
+    # Every source of a plan file in one run
+    python load-transactions.py --type all --plan plan.json
+
 For more information, run with --help
 """
 
@@ -0,0 +1,123 @@
+"""
+Ingest Manifest - Skip statement files that were already loaded.
+
+This module provides a service class that fingerprints statement files and
+checks them against the ingest_manifest table, so unchanged files are skipped
+without being parsed and files that only append rows to a previously loaded
+file (e.g. year-to-date exports) only load the new rows.
+"""
+
+import hashlib
+import os
+import uuid
+
+import psycopg
+
+from db.finance_base import FinanceDB
+
+
+class IngestManifest:
+    """
+    File-level record of the statements loaded into a database.
+
+    Each loaded file is recorded with its content hash, size, card type and the
+    number of rows its loader produced. On a database without the
+    ingest_manifest table the manifest disables itself and every file is loaded
+    in full.
+    """
+
+    def __init__(self, database: FinanceDB, run_id: str | None = None):
+        """
+        Initialize ingest manifest.
+
+        Args:
+            database: Database holding the ingest_manifest table
+            run_id: Identifier recorded with every file of this run
+        """
+        self.database = database
+        self.run_id = run_id or uuid.uuid4().hex
+        # False once the ingest_manifest table turned out to be missing
+        self.enabled = True
+        # manifest rows per card type, loaded on first use
+        self._ingested_files: dict[str, list[tuple[str, int, int]]] = {}
+        # file path -> (content_hash, size) computed by `check`
+        self._fingerprints: dict[str, tuple[str, int]] = {}
+
+    def _get_ingested_files(self, card_type: str) -> list[tuple[str, int, int]]:
+        if card_type not in self._ingested_files:
+            self._ingested_files[card_type] = self.database.get_ingested_files(
+                card_type
+            )
+        return self._ingested_files[card_type]
+
+    def check(self, card_type: str, file_path: str) -> int | None:
+        """
+        Check a file against the manifest before loading it.
+
+        Args:
+            card_type: Type of credit card
+            file_path: Path to the statement file
+
+        Returns:
+            None if the identical file was already loaded, otherwise the number
+            of leading rows already loaded from an earlier version of the file
+            that this file appends to (0 for a new file). Unreadable files return
+            0 and are left to the loader to report.
+        """
+        if not self.enabled:
+            return 0
+        try:
+            with open(file_path, "rb") as f:
+                content = f.read()
+        except OSError:
+            return 0
+        try:
+            ingested_files = self._get_ingested_files(card_type)
+        except psycopg.errors.UndefinedTable:
+            print(
+                f"WARNING: {self.database.database_name} has no ingest_manifest table, "
+                f"loading every file in full. Create it with "
+                f"ddl/{self.database.database_name}/ingest_manifest.sql"
+            )
+            self.enabled = False
+            return 0
+        content_hash = hashlib.sha256(content).hexdigest()
+        self._fingerprints[file_path] = (content_hash, len(content))
+
+        loaded_rows = 0
+        for ingested_hash, size, row_count in sorted(
+            ingested_files, key=lambda row: row[1], reverse=True
+        ):
+            if ingested_hash == content_hash:
+                return None
+            # an earlier version must end on a full line to count as a prefix
+            if (
+                not loaded_rows
+                and size < len(content)
+                and content[size - 1 : size] == b"\n"
+                and hashlib.sha256(content[:size]).hexdigest() == ingested_hash
+            ):
+                loaded_rows = row_count
+        return loaded_rows
+
+    def record(self, card_type: str, file_path: str, row_count: int) -> None:
+        """
+        Record a loaded file in the manifest.
+
+        Args:
+            card_type: Type of credit card
+            file_path: Path to the statement file, previously passed to `check`
+            row_count: Number of rows the loader produced for the whole file
+        """
+        if not self.enabled or file_path not in self._fingerprints:
+            return
+        content_hash, size = self._fingerprints[file_path]
+        self.database.record_ingested_file(
+            os.path.basename(file_path),
+            content_hash,
+            size,
+            card_type,
+            row_count,
+            self.run_id,
+        )
+        self._get_ingested_files(card_type).append((content_hash, size, row_count))
@@ -0,0 +1,93 @@
+"""
+Review Queue - Categorize unresolved transactions one merchant at a time.
+
+This module provides a service class that groups the transactions the
+automatic categorization could not resolve by merchant, asks the user once
+per merchant, and applies the answer to every transaction in the group.
+"""
+
+import polars as pl
+
+from db.finance_base import FinanceDB
+from db.reference_data import normalize_name_expr
+
+
+class ReviewQueue:
+    """
+    Grouped manual review of unresolved transactions.
+
+    Transactions are grouped by normalized merchant name (case-insensitive,
+    ignoring non-breaking spaces), so a merchant appearing many times in a
+    statement is only asked about once.
+    """
+
+    def __init__(self, database: FinanceDB):
+        """
+        Initialize review queue.
+
+        Args:
+            database: Database providing the category prompts and auto_match table
+        """
+        self.database = database
+
+    def review(self, df: pl.DataFrame) -> tuple[pl.DataFrame, pl.DataFrame]:
+        """
+        Ask the user to categorize each group of unresolved transactions.
+
+        Args:
+            df: DataFrame of unresolved transactions
+
+        Returns:
+            Tuple of (reviewed, skipped). Reviewed transactions carry their id
+            columns, ready for `FinanceDB.bulk_insert_expenses`. Skipped holds the
+            transactions of the groups the user skipped.
+        """
+        groups = (
+            df.with_columns(normalize_name_expr(pl.col("merchant")).alias("group"))
+            .group_by("group", maintain_order=True)
+            .agg(pl.all())
+        )
+        reviewed = []
+        skipped = []
+        for idx, group in enumerate(groups.iter_rows(named=True), 1):
+            rows = pl.DataFrame(
+                {column: group[column] for column in df.columns}, schema=df.schema
+            )
+            merchants = rows.get_column("merchant").unique(maintain_order=True)
+            print("\n\n")
+            print(
+                f"Merchant {idx}/{groups.height}: {merchants[0]} "
+                f"({rows.height} transactions, total {rows.get_column('cost').sum()})"
+            )
+            print(rows)
+
+            expense_ids = self.database.ask_for_category()
+            if expense_ids is None:
+                skipped.append(rows)
+                continue
+            reviewed.append(
+                rows.with_columns(
+                    pl.lit(value, dtype=pl.Int64).alias(column)
+                    for column, value in expense_ids.items()
+                )
+            )
+
+            # offer every spelling of the merchant to the auto_match table at once
+            new_merchants = [
+                merchant
+                for merchant in merchants
+                if merchant not in self.database.auto_match_excluded_merchants
+            ]
+            if new_merchants and self.database.confirm_add_to_auto_match():
+                labels = self.database.get_auto_match_labels(expense_ids)
+                with self.database.transaction():
+                    for merchant in new_merchants:
+                        self.database.insert_into_auto_match(merchant, *labels)
+
+        skipped_df = pl.concat(skipped) if skipped else df.clear()
+        if not reviewed:
+            return (df.clear(), skipped_df)
+        return (
+            self.database.filter_insertable_expenses(pl.concat(reviewed)),
+            skipped_df,
+        )
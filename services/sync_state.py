@@ -0,0 +1,87 @@
+"""
+Sync State - Only fetch new activity from online sources.
+
+This module provides a service class that keeps a cursor per online source in
+the sync_state table, so a sync only fetches the activity posted since the
+previous one instead of the full history.
+"""
+
+from datetime import date, timedelta
+
+import polars as pl
+import psycopg
+
+from db.finance_base import FinanceDB
+
+
+class SyncState:
+    """
+    Persisted sync cursors of the online sources.
+
+    The cursor is the date of the newest transaction loaded from a source. A
+    sync fetches from `overlap_days` before the cursor, so activity that posts
+    late with an earlier date is still picked up; the overlapping transactions
+    are dropped by the usual duplicate checks. The cursor stops at the oldest
+    transaction the user skipped, so skipped transactions are offered again
+    until they are categorized. On a database without the sync_state table the
+    cursors are disabled and every sync fetches the full history.
+    """
+
+    # days before the cursor that are fetched again
+    overlap_days: int = 7
+
+    def __init__(self, database: FinanceDB):
+        """
+        Initialize sync state.
+
+        Args:
+            database: Database holding the sync_state table
+        """
+        self.database = database
+        # False once the sync_state table turned out to be missing
+        self.enabled = True
+
+    def since(self, card_type: str) -> date | None:
+        """
+        Get the date from which a source's activity should be fetched.
+
+        Returns:
+            The earliest date to fetch, or None to fetch the full history
+        """
+        if not self.enabled:
+            return None
+        try:
+            cursor = self.database.get_sync_cursor(card_type)
+        except psycopg.errors.UndefinedTable:
+            print(
+                f"WARNING: {self.database.database_name} has no sync_state table, "
+                f"fetching the full history. Create it with "
+                f"ddl/{self.database.database_name}/sync_state.sql"
+            )
+            self.enabled = False
+            return None
+        if cursor is None:
+            return None
+        return cursor - timedelta(days=self.overlap_days)
+
+    def record(
+        self,
+        card_type: str,
+        df: pl.DataFrame,
+        uncategorized: pl.DataFrame | None = None,
+    ) -> None:
+        """
+        Advance a source's cursor after a sync.
+
+        Args:
+            card_type: Online source that was synced
+            df: Transactions fetched from the source
+            uncategorized: Fetched transactions the user skipped
+        """
+        if not self.enabled or df.height == 0:
+            return
+        cursor = df.get_column("date").max()
+        if uncategorized is not None and uncategorized.height > 0:
+            # hold the cursor back so the skipped transactions are fetched again
+            cursor = min(cursor, uncategorized.get_column("date").min())
+        self.database.set_sync_cursor(card_type, cursor)
@@ -5,9 +5,18 @@ This module provides a service class for loading transaction data from
 various credit card statement sources.
 """
 
+import threading
+import time
+from collections.abc import Callable, Iterator
+from concurrent import futures
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import date
+from functools import partial
+
 import polars as pl
 
-from sources.registry import get_card_class, requires_file
+from sources.registry import get_card_class, get_fetch_timeout, requires_file
 
 
 class TransactionLoader:
@@ -18,13 +27,17 @@ class TransactionLoader:
     statement class for each card type.
     """
 
-    def load(self, card_type: str, file_path: str = None) -> pl.DataFrame:
+    def load(
+        self, card_type: str, file_path: str = None, since: date | None = None
+    ) -> pl.DataFrame:
         """
         Load credit card statement data based on card type.
 
         Args:
             card_type: Type of credit card
             file_path: Path to the transaction data file (not needed for online card types)
+            since: Only fetch online activity on or after this date (None for the
+                full history)
 
         Returns:
             pl.DataFrame: Loaded transaction data with standardized columns
@@ -39,7 +52,7 @@ class TransactionLoader:
         if requires_file(card_type):
             return statement_class(file_path=file_path).get_df()
         else:
-            return statement_class().get_df()
+            return statement_class(since=since).get_df()
 
     def load_from_file(self, card_type: str, file_path: str) -> pl.DataFrame:
         """
@@ -63,7 +76,9 @@ class TransactionLoader:
             )
         return self.load(card_type, file_path)
 
-    def load_from_online(self, card_type: str) -> pl.DataFrame:
+    def load_from_online(
+        self, card_type: str, since: date | None = None
+    ) -> pl.DataFrame:
         """
         Load transaction data from online source.
 
@@ -71,6 +86,7 @@ class TransactionLoader:
 
         Args:
             card_type: Type of credit card
+            since: Only fetch activity on or after this date
 
         Returns:
             pl.DataFrame: Loaded transaction data
@@ -82,4 +98,65 @@ class TransactionLoader:
             raise ValueError(
                 f"Card type {card_type} requires a file input (not online)"
             )
-        return self.load(card_type)
+        return self.load(card_type, since=since)
+
+    @contextmanager
+    def fetch_online(
+        self, sources: dict[str, date | None]
+    ) -> Iterator[dict[str, Callable[[], pl.DataFrame]]]:
+        """
+        Fetch several online sources concurrently.
+
+        Every source is fetched in its own daemon thread as soon as the block is
+        entered, so the total wait is that of the slowest source instead of the
+        sum of all of them. A source that times out is abandoned: its thread is
+        left running in the background and does not keep the process alive at
+        exit.
+
+        Args:
+            sources: Card types to fetch, mapped to the date to fetch from (None
+                for the full history)
+
+        Yields:
+            One callable per card type returning its DataFrame, or raising its
+            error or a TimeoutError once the source's timeout (counted from the
+            start of the fetch) has passed
+        """
+        started = time.monotonic()
+        pending = {
+            card_type: self._fetch_in_background(card_type, since)
+            for card_type, since in sources.items()
+        }
+
+        def wait(card_type: str) -> pl.DataFrame:
+            timeout = get_fetch_timeout(card_type)
+            remaining = None
+            if timeout is not None:
+                remaining = max(started + timeout - time.monotonic(), 0)
+            try:
+                return pending[card_type].result(timeout=remaining)
+            except futures.TimeoutError:
+                raise TimeoutError(
+                    f"{card_type} was not fetched within {timeout} seconds"
+                ) from None
+
+        yield {card_type: partial(wait, card_type) for card_type in pending}
+
+    def _fetch_in_background(self, card_type: str, since: date | None) -> Future:
+        """
+        Start fetching an online source in a daemon thread.
+
+        Returns:
+            Future resolved with the source's DataFrame or its error
+        """
+        future = Future()
+        future.set_running_or_notify_cancel()
+
+        def fetch() -> None:
+            try:
+                future.set_result(self.load_from_online(card_type, since))
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=fetch, name=f"fetch-{card_type}", daemon=True).start()
+        return future
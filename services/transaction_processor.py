@@ -6,12 +6,26 @@ of credit card transaction files, including loading data and inserting
 into the database.
 """
 
+import multiprocessing
 import os
+from collections.abc import Callable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack, contextmanager
+from functools import partial
 
 import polars as pl
 
 from db.finance_base import FinanceDB
+from services.ingest_manifest import IngestManifest
+from services.review_queue import ReviewQueue
+from services.sync_state import SyncState
 from services.transaction_loader import TransactionLoader
+from sources.registry import (
+    AUTO_CARD_TYPE,
+    ONLINE_CARD_TYPE,
+    detect_card_type,
+    get_online_card_types,
+)
 from utils.processing_results import ProcessingResults
 
 
@@ -23,18 +37,36 @@ class TransactionProcessor:
     and inserting them into the database.
     """
 
-    def __init__(self, database: FinanceDB, loader: TransactionLoader):
+    def __init__(
+        self,
+        database: FinanceDB,
+        loader: TransactionLoader,
+        review: bool = False,
+        jobs: int = 1,
+        manifest: IngestManifest | None = None,
+        sync_state: SyncState | None = None,
+    ):
         """
         Initialize transaction processor.
 
         Args:
             database: Database instance for storing transactions
             loader: Transaction loader service for loading card data
+            review: Ask once per unknown merchant instead of once per transaction
+            jobs: Number of files parsed in parallel worker processes
+            manifest: Ingest manifest used to skip files that were already loaded
+            sync_state: Sync cursors used to only fetch new online activity
         """
         self.database = database
         self.loader = loader
+        self.review = review
+        self.jobs = jobs
+        self.manifest = manifest
+        self.sync_state = sync_state
 
-    def _insert_transactions(self, df: pl.DataFrame, card_type: str) -> int:
+    def _insert_transactions(
+        self, df: pl.DataFrame, card_type: str
+    ) -> tuple[int, int, pl.DataFrame]:
         """
         Insert transactions from DataFrame into database.
 
@@ -43,105 +75,333 @@ class TransactionProcessor:
             card_type: Type of credit card
 
         Returns:
-            Number of rows inserted
+            Tuple of (inserted_rows, skipped_rows, uncategorized) where skipped
+            rows already existed or were skipped by the user, and uncategorized
+            holds the transactions the user skipped
         """
-        new_inserted_rows = 0
-
-        for row in df.iter_rows(named=True):
-            date = row["date"]
-            merchant = row["merchant"]
-            cost = row["cost"]
-            cc_category = row["cc_category"]
-
-            # Check if transaction already exists in expenses table
-            if not self.database.check_if_expense_exists(date, merchant, cost):
-                print("\n\n")
-                print("New transaction found")
+        # Drop transactions already in the expenses table in one round trip
+        new_df = self.database.filter_new_expenses(df)
+
+        # Categorize every new transaction at once and bulk insert the resolved ones
+        resolved, unresolved = self.database.categorize_expenses(new_df, card_type)
+        if resolved.height > 0:
+            print("\n\n")
+            print(f"Auto-categorized {resolved.height} new transactions")
+            print(resolved)
+        new_inserted_rows, conflicting_rows = self.database.bulk_insert_expenses(
+            resolved
+        )
+
+        # Ask the user about the rest, grouped by merchant in review mode
+        if self.review and unresolved.height > 0:
+            reviewed, skipped = ReviewQueue(self.database).review(unresolved)
+            inserted, conflicting = self.database.bulk_insert_expenses(reviewed)
+            return (
+                new_inserted_rows + inserted,
+                df.height
+                - new_df.height
+                + conflicting_rows
+                + conflicting
+                + skipped.height,
+                skipped,
+            )
+
+        skipped_rows = []
+        for idx, row in enumerate(unresolved.iter_rows(named=True)):
+            print("\n\n")
+            print("New transaction found")
+            skipped_count = self.database.skipped_expense_count
+            # each interactive decision gets its own savepoint
+            with self.database.transaction():
                 self.database.insert_expense(
-                    date, merchant, cost, card_type, cc_category
+                    row["date"],
+                    row["merchant"],
+                    row["cost"],
+                    card_type,
+                    row["cc_category"],
                 )
+            if self.database.skipped_expense_count > skipped_count:
+                skipped_rows.append(idx)
+            else:
                 new_inserted_rows += 1
 
-        return new_inserted_rows
+        return (
+            new_inserted_rows,
+            df.height - new_df.height + conflicting_rows + len(skipped_rows),
+            unresolved.with_row_index("_row")
+            .filter(pl.col("_row").is_in(skipped_rows))
+            .drop("_row"),
+        )
 
-    def _process_single_file(
-        self, card_type: str, file_path: str, file_name: str
-    ) -> tuple[int, int]:
+    def _write_transactions(
+        self, card_type: str, df: pl.DataFrame
+    ) -> tuple[int, int, int, pl.DataFrame]:
         """
-        Process a single transaction file.
+        Write the transactions of a single loaded file.
 
         Args:
             card_type: Type of credit card
-            file_path: Path to file (or None for online sources)
-            file_name: Display name for the file
+            df: Transactions loaded from the file
 
         Returns:
-            Tuple of (inserted_rows, total_rows)
-
-        Raises:
-            Exception: If file processing fails
+            Tuple of (inserted_rows, skipped_rows, total_rows, uncategorized)
         """
-        # Load data
-        if file_path is None:
-            print(f"Loading {card_type} data from online source")
-        else:
-            print(f"Loading {card_type} data from {file_path}")
-
-        df = self.loader.load(card_type, file_path)
-        print("Data loaded")
-
-        # Insert transactions if DataFrame has data
+        # Insert transactions if DataFrame has data, committing the file at once
         if df.height > 0:
-            inserted_rows = self._insert_transactions(df, card_type)
-            return (inserted_rows, df.height)
+            with self.database.transaction():
+                inserted_rows, skipped_rows, uncategorized = self._insert_transactions(
+                    df, card_type
+                )
+            return (inserted_rows, skipped_rows, df.height, uncategorized)
         else:
             print("No data to process in the file")
-            return (0, 0)
+            return (0, 0, 0, df)
+
+    @contextmanager
+    def _file_loaders(
+        self, files: list[tuple[str, str | None]]
+    ) -> Iterator[list[Callable[[], pl.DataFrame]]]:
+        """
+        Get a loader for each file, in the order of the files.
+
+        Online sources are all fetched concurrently in threads. With more than
+        one job the files are parsed ahead in a process pool. Each loader waits
+        for its own source, so the database writes still happen one source at a
+        time in order.
+
+        Args:
+            files: List of (card_type, file_path) to load (file_path is None for
+                online sources)
+
+        Yields:
+            One callable per file returning its DataFrame (or raising its error)
+        """
+        # online sources only fetch the activity since their sync cursor. A
+        # source whose cursor can't be read fails on its own.
+        online_sources = {}
+        cursor_errors = {}
+        for card_type, file_path in files:
+            if file_path is not None:
+                continue
+            try:
+                online_sources[card_type] = (
+                    self.sync_state.since(card_type)
+                    if self.sync_state is not None
+                    else None
+                )
+            except Exception as e:
+                cursor_errors[card_type] = e
+        local_files = [
+            (card_type, file_path)
+            for card_type, file_path in files
+            if file_path is not None
+        ]
+        with ExitStack() as stack:
+            online_loaders = stack.enter_context(
+                self.loader.fetch_online(online_sources)
+            )
+            for card_type, error in cursor_errors.items():
+                online_loaders[card_type] = partial(_raise, error)
+            if self.jobs <= 1 or len(local_files) <= 1:
+                file_loaders = [
+                    partial(self.loader.load_from_file, card_type, file_path)
+                    for card_type, file_path in local_files
+                ]
+            else:
+                # spawn rather than fork, so workers don't inherit the pooled
+                # database connections or polars' thread pool
+                executor = stack.enter_context(
+                    ProcessPoolExecutor(
+                        max_workers=self.jobs,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+                )
+                pending = [
+                    executor.submit(self.loader.load_from_file, card_type, file_path)
+                    for card_type, file_path in local_files
+                ]
+                for future in pending:
+                    stack.callback(future.cancel)
+                file_loaders = [future.result for future in pending]
+
+            file_loaders = iter(file_loaders)
+            yield [
+                online_loaders[card_type] if file_path is None else next(file_loaders)
+                for card_type, file_path in files
+            ]
 
     def process_files(self, card_type: str, files: list[str]) -> ProcessingResults:
         """
         Process multiple transaction files.
 
         Args:
-            card_type: Type of credit card
+            card_type: Type of credit card, "auto" to detect it for each file, or
+                "online" to fetch every online source
             files: List of file paths to process (or [None] for online sources)
 
         Returns:
             ProcessingResults object with processing summary
         """
+        return self.process_plan([(card_type, files)])
+
+    def process_plan(self, plan: list[tuple[str, list[str]]]) -> ProcessingResults:
+        """
+        Process the files of several card types in a single run.
+
+        Every source of the plan shares the database session and caches, online
+        sources are fetched concurrently and files are parsed ahead together.
+
+        Args:
+            plan: List of (card_type, files) as taken by `process_files`
+
+        Returns:
+            ProcessingResults object with processing summary, labelled by card type
+        """
         results = ProcessingResults()
 
-        # Process each file
-        for idx, file_path in enumerate(files, 1):
-            # Determine file name for display
-            if file_path is None:
-                file_name = f"{card_type} (online)"
-            else:
-                file_name = os.path.basename(file_path)
+        # Resolve the (card_type, file_path) of each source, detecting the card
+        # type from the file in auto mode
+        sources = []
+        detected = set()
+        detection_errors = {}
+        for card_type, files in plan:
+            for file_path in files:
+                if card_type == ONLINE_CARD_TYPE:
+                    resolved = [
+                        (online_type, None)
+                        for online_type in sorted(get_online_card_types())
+                    ]
+                elif card_type != AUTO_CARD_TYPE:
+                    resolved = [(card_type, file_path)]
+                else:
+                    try:
+                        resolved = [(detect_card_type(file_path), file_path)]
+                        detected.add(file_path)
+                    except (ValueError, OSError) as e:
+                        resolved = [(None, file_path)]
+                        detection_errors[file_path] = str(e)
+                # a source listed twice is only processed once
+                sources.extend(source for source in resolved if source not in sources)
 
-            # Print progress header
-            if len(files) > 1:
-                print(f"\n{'=' * 80}")
-                print(f"Processing file {idx}/{len(files)}: {file_name}")
-                print(f"{'=' * 80}\n")
-            else:
-                print(f"Processing: {file_name}\n")
+        # Check the files against the ingest manifest before parsing them.
+        # None marks an unchanged file, otherwise the number of leading rows
+        # already loaded from an earlier version of the file.
+        # A file that can't be checked is reported as a failure of its own.
+        loaded_rows = {}
+        check_errors = {}
+        if self.manifest is not None:
+            for file_card_type, file_path in sources:
+                if file_card_type is not None and file_path is not None:
+                    try:
+                        loaded_rows[file_path] = self.manifest.check(
+                            file_card_type, file_path
+                        )
+                    except Exception as e:
+                        check_errors[file_path] = str(e)
+        sources_to_load = [
+            (file_card_type, file_path)
+            for file_card_type, file_path in sources
+            if file_card_type is not None
+            and file_path not in check_errors
+            and loaded_rows.get(file_path, 0) is not None
+        ]
 
-            # Process the file
-            try:
-                inserted, total = self._process_single_file(
-                    card_type, file_path, file_name
-                )
-                results.add_success(file_name, inserted, total)
+        # Process each source in order, fetching online sources concurrently and
+        # parsing files ahead in worker processes if requested
+        with self._file_loaders(sources_to_load) as loaders:
+            loaders = dict(zip(sources_to_load, loaders))
+            for idx, (file_card_type, file_path) in enumerate(sources, 1):
+                # Determine file name for display
+                if file_path is None:
+                    file_name = f"{file_card_type} (online)"
+                else:
+                    file_name = os.path.basename(file_path)
 
-            except KeyboardInterrupt:
-                print("Keyboard interrupt")
-                raise
+                # Print progress header
+                if len(sources) > 1:
+                    print(f"\n{'=' * 80}")
+                    print(f"Processing file {idx}/{len(sources)}: {file_name}")
+                    print(f"{'=' * 80}\n")
+                else:
+                    print(f"Processing: {file_name}\n")
 
-            except Exception as e:
-                print(f"ERROR processing file {file_name}: {e}")
-                results.add_failure(file_name, str(e))
-                # Continue processing remaining files
-                continue
+                if file_path in detection_errors:
+                    print(
+                        f"ERROR processing file {file_name}: {detection_errors[file_path]}"
+                    )
+                    results.add_failure(
+                        file_name, detection_errors[file_path], AUTO_CARD_TYPE
+                    )
+                    continue
+                if file_path in detected:
+                    print(f"Detected card type: {file_card_type}")
+                if file_path in check_errors:
+                    print(
+                        f"ERROR processing file {file_name}: {check_errors[file_path]}"
+                    )
+                    results.add_failure(
+                        file_name, check_errors[file_path], file_card_type
+                    )
+                    continue
+
+                if (file_card_type, file_path) not in loaders:
+                    print("File is unchanged since it was last loaded, skipping")
+                    results.add_unchanged(file_name, file_card_type)
+                    continue
+
+                # Process the file
+                try:
+                    # Load data
+                    if file_path is None:
+                        print(f"Loading {file_card_type} data from online source")
+                    else:
+                        print(f"Loading {file_card_type} data from {file_path}")
+                    df = loaders[(file_card_type, file_path)]()
+                    print("Data loaded")
+
+                    # Only write the rows appended since an earlier version was loaded
+                    already_loaded = loaded_rows.get(file_path, 0)
+                    if already_loaded > 0:
+                        print(
+                            f"File extends a previously loaded file, processing the "
+                            f"last {max(df.height - already_loaded, 0)}/{df.height} rows"
+                        )
+
+                    # Write the file and record it in the manifest (or advance the
+                    # sync cursor of an online source) together
+                    with self.database.transaction():
+                        inserted, skipped, total, uncategorized = (
+                            self._write_transactions(
+                                file_card_type, df.slice(already_loaded)
+                            )
+                        )
+                        if self.manifest is not None and file_path is not None:
+                            self.manifest.record(file_card_type, file_path, df.height)
+                        if self.sync_state is not None and file_path is None:
+                            self.sync_state.record(file_card_type, df, uncategorized)
+                    results.add_success(
+                        file_name,
+                        inserted,
+                        total + already_loaded,
+                        skipped + already_loaded,
+                        file_card_type,
+                    )
+
+                except KeyboardInterrupt:
+                    print("Keyboard interrupt")
+                    raise
+
+                except Exception as e:
+                    print(f"ERROR processing file {file_name}: {e}")
+                    results.add_failure(file_name, str(e), file_card_type)
+                    # Continue processing remaining files
+                    continue
 
         return results
+
+
+def _raise(error: Exception) -> pl.DataFrame:
+    """
+    Loader of a source that failed before it could be loaded.
+    """
+    raise error
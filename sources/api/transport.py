@@ -0,0 +1,182 @@
+"""
+Activity Transport - Where online statements get their account activity from.
+
+This module provides the transports used by `OnlineCardStatement`: the live
+wealthsimpleton client, a recorder that snapshots its responses to disk, a
+replay of those snapshots, and synthetic histories of any size, so the online
+sources can be run and benchmarked offline.
+
+The transport is chosen with the ONLINE_TRANSPORT setting:
+    live (default), record:<directory>, replay:<directory> or synthetic:<count>
+
+Only the live and recording transports serve the account's real activity.
+Replayed and synthetic activity must not advance the sync cursors, and is only
+written to a database when explicitly allowed.
+"""
+
+import json
+import os
+import random
+from abc import ABC, abstractmethod
+from collections.abc import Iterable
+from datetime import datetime, timedelta
+
+
+class ActivityTransport(ABC):
+    """
+    Source of the raw activity entries of an online account.
+
+    Entries are dicts with ISO formatted "date", "description", "type" and
+    "amount" fields, newest first, as returned by wealthsimpleton.
+    """
+
+    # whether the activity is the account's current real activity
+    live_data: bool = False
+
+    @abstractmethod
+    def get_transactions(self, source: str, account: str) -> Iterable[dict]:
+        """
+        Get the activity of an account.
+
+        Args:
+            source: Card type of the statement (e.g. ws_debit)
+            account: Account activity link of the source
+        """
+
+
+class LiveTransport(ActivityTransport):
+    """
+    Fetch the activity from Wealthsimple with wealthsimpleton.
+    """
+
+    live_data = True
+
+    def get_transactions(self, source: str, account: str) -> Iterable[dict]:
+        # imported here so the other transports work without the optional package
+        from wealthsimpleton import wealthsimpleton as ws
+
+        return ws.get_transactions(account_activity_url_suffix=account)
+
+
+class RecordingTransport(ActivityTransport):
+    """
+    Pass the activity of another transport through, saving a snapshot of it.
+    """
+
+    def __init__(self, transport: ActivityTransport, directory: str):
+        """
+        Initialize recording transport.
+
+        Args:
+            transport: Transport the activity is fetched with
+            directory: Directory the snapshots are written to, one per source
+        """
+        self.transport = transport
+        self.directory = directory
+        self.live_data = transport.live_data
+
+    def get_transactions(self, source: str, account: str) -> Iterable[dict]:
+        activity = list(self.transport.get_transactions(source, account))
+        os.makedirs(self.directory, exist_ok=True)
+        snapshot_path = os.path.join(self.directory, f"{source}.json")
+        with open(snapshot_path, "w") as f:
+            json.dump(activity, f)
+        print(f"Recorded {len(activity)} {source} activities to {snapshot_path}")
+        return activity
+
+
+class ReplayTransport(ActivityTransport):
+    """
+    Serve the snapshots saved by `RecordingTransport`.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Initialize replay transport.
+
+        Args:
+            directory: Directory holding the snapshots
+        """
+        self.directory = directory
+
+    def get_transactions(self, source: str, account: str) -> Iterable[dict]:
+        snapshot_path = os.path.join(self.directory, f"{source}.json")
+        if not os.path.exists(snapshot_path):
+            raise FileNotFoundError(
+                f"No recorded {source} activity in {self.directory}, "
+                f"record it first with ONLINE_TRANSPORT=record:{self.directory}"
+            )
+        with open(snapshot_path) as f:
+            return json.load(f)
+
+
+class SyntheticTransport(ActivityTransport):
+    """
+    Generate random activity histories, one entry per hour going back from now.
+
+    The histories use the formats of the real feed: Unicode minus signs and
+    thousands separators in amounts, and every activity type the statements
+    filter on.
+    """
+
+    # activity types generated for each source, with their relative frequency
+    activity_types = {
+        "ws_debit": {
+            "Pre-authorized debit": 4,
+            "Bill pay": 2,
+            "Interac e-Transfer": 2,
+            "Direct deposit": 1,
+            "Electronic funds transfer": 1,
+            "Chequing": 1,
+        },
+        "ws_credit": {"Purchase": 8, "Refund": 1, "Payment": 1},
+    }
+    merchants = ["AMEX BILL PYMT", "BMO MASTERCARD", "GROCERY", "COFFEE", "HYDRO"]
+
+    def __init__(self, count: int, seed: int = 0):
+        """
+        Initialize synthetic transport.
+
+        Args:
+            count: Number of activities generated per source
+            seed: Random seed, the same seed generates the same histories
+        """
+        self.count = count
+        self.seed = seed
+
+    def get_transactions(self, source: str, account: str) -> Iterable[dict]:
+        rng = random.Random(f"{self.seed}-{source}")
+        types = self.activity_types.get(source, {"Purchase": 1})
+        start = datetime.now().replace(minute=0, second=0, microsecond=0)
+        for i in range(self.count):
+            amount = f"${rng.randint(1, 500_000) / 100:,.2f}"
+            if source == "ws_debit" and rng.random() < 0.8:
+                amount = f"−{amount}"
+            yield {
+                "date": (start - timedelta(hours=i)).isoformat(),
+                "description": rng.choice(self.merchants),
+                "type": rng.choices(list(types), weights=list(types.values()))[0],
+                "amount": amount,
+            }
+
+
+def get_transport(setting: str | None) -> ActivityTransport:
+    """
+    Build the transport selected by an ONLINE_TRANSPORT setting.
+
+    Raises:
+        ValueError: If the setting is not recognized
+    """
+    mode, _, argument = (setting or "live").partition(":")
+    if mode == "live":
+        return LiveTransport()
+    if mode == "record" and argument:
+        return RecordingTransport(LiveTransport(), argument)
+    if mode == "replay" and argument:
+        return ReplayTransport(argument)
+    if mode == "synthetic" and argument.isdigit():
+        return SyntheticTransport(int(argument))
+    raise ValueError(
+        f"Invalid ONLINE_TRANSPORT {setting!r}, expected live, record:<directory>, "
+        f"replay:<directory> or synthetic:<count>"
+    )
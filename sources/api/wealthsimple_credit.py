@@ -1,6 +1,8 @@
+from datetime import date
+
 import polars as pl
-from wealthsimpleton import wealthsimpleton as ws
 
+from sources.api.transport import ActivityTransport
 from sources.base import OnlineCardStatement
 
 
@@ -9,8 +11,12 @@ class WealthsimpleCreditStatement(OnlineCardStatement):
     refund = "Refund"
     acceptable_types = [purchase, refund]
 
-    def __init__(self):
-        super().__init__(type="ws_credit")
+    activity_fields = ["date", "description", "type", "amount"]
+
+    def __init__(
+        self, since: date | None = None, transport: ActivityTransport | None = None
+    ):
+        super().__init__(type="ws_credit", since=since, transport=transport)
 
     def load_data(self) -> None:
         """
@@ -36,10 +42,10 @@ class WealthsimpleCreditStatement(OnlineCardStatement):
         """
         print("================================================")
         print("load data start from wealthsimple_credit.py")
-        transactions: list[dict] = ws.get_transactions(
-            account_activity_url_suffix=self.config.ws_credit_link
+        # only the activity since the sync cursor, in a columnar buffer
+        df = self.collect_activity(
+            self.transport.get_transactions(self.type, self.config.ws_credit_link)
         )
-        df = pl.DataFrame(transactions)
         df1 = df.filter(pl.col("type").is_in(self.acceptable_types))
 
         # merge description & type
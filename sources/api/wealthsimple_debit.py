@@ -1,12 +1,22 @@
+from datetime import date
+
 import polars as pl
 
+from sources.api.transport import ActivityTransport
 from sources.base import OnlineCardStatement
-from wealthsimpleton import wealthsimpleton as ws
+from sources.ref_data import skip_rules_ref
+from utils.skip_rules import SkipRules
 
 
 class WealthsimpleDebitStatement(OnlineCardStatement):
-    def __init__(self):
-        super().__init__(type="ws_debit")
+    skip_rules = SkipRules("ws_debit", skip_rules_ref["ws_debit"])
+
+    activity_fields = ["date", "description", "type", "amount"]
+
+    def __init__(
+        self, since: date | None = None, transport: ActivityTransport | None = None
+    ):
+        super().__init__(type="ws_debit", since=since, transport=transport)
 
     def load_data(self) -> None:
         """
@@ -25,74 +35,12 @@ class WealthsimpleDebitStatement(OnlineCardStatement):
         Raises:
             ValueError: If the file doesn't exist or required headers can't be found
         """
-        transactions: list[dict] = ws.get_transactions(
-            account_activity_url_suffix=self.config.ws_debt_link
-        )
-        df = pl.DataFrame(transactions)
-        df1 = df.filter(
-            ~(
-                pl.col("type").is_in(
-                    [
-                        "Chequing",
-                        "Visa Infinite",
-                        "Direct deposit",
-                        "Electronic funds transfer",
-                    ]
-                )
-            )
-        )
-
-        # in pre-authorized debit, ignore AMEX BILL PYMT
-        # in bill pay, ignore BMO MASTERCARD and ROGERS BANK-MASTERCARD
-        # ignore Interac e-Transfer: Nathan Li Simplii
-        df2 = df1.filter(
-            ~(
-                (
-                    (pl.col("type") == "Pre-authorized debit")
-                    & (
-                        pl.col("description").is_in(
-                            ["AMEX BILL PYMT", "Coinbase", "CDN TIRE", "AMEX"]
-                        )
-                    )
-                )
-                | (
-                    (pl.col("type") == "Bill pay")
-                    & (
-                        pl.col("description").is_in(
-                            [
-                                "BMO MASTERCARD",
-                                "ROGERS BANK-MASTERCARD",
-                                "VISA ROYAL BANK",
-                                "SIMPLII FINANCIAL CASH BACK VISA",
-                                "Triangle MC",
-                                "BRIM FINANCIAL",
-                                "Amazon MBNA",
-                            ]
-                        )
-                    )
-                )
-                | (
-                    (pl.col("type") == "Interac e-Transfer")
-                    & (
-                        pl.col("description").is_in(
-                            [
-                                "Nathan Li Simplii",
-                                "Nathan Li",
-                                "NATHAN CHI CHUNG LI",
-                                "NDAX PAYMENT",
-                                "KIT MEI TONG",
-                                "Nathan Li EQ Bank",
-                                "Simplii Nathan",
-                            ]
-                        )
-                    )
-                )
-                | (
-                    (pl.col("type") == "Credit card payment")
-                    & (pl.col("description") == "Wealthsimple credit card")
-                )
-            )
+        # only the activity since the sync cursor, in a columnar buffer
+        df = self.collect_activity(
+            self.transport.get_transactions(self.type, self.config.ws_debt_link)
         )
+        # drop transfers, card payments, etc. in a single pass
+        df2 = self.skip_rules.apply(df)
 
         # merge description & type
         df3 = df2.with_columns(
@@ -1,15 +1,73 @@
+import csv
 import os
+import re
 from abc import ABC, abstractmethod
+from collections.abc import Iterable
+from datetime import date, datetime
+from itertools import islice
 
 import polars as pl
 
 from config import Config
+from sources.api.transport import ActivityTransport, get_transport
+from utils.skip_rules import SkipRules
+
+
+EXCEL_EXTENSIONS = (".xlsx", ".xlsm", ".xls")
+
+
+def read_leading_rows(file_path: str, n_rows: int) -> list[list]:
+    """
+    Read the first rows of a CSV or Excel file without parsing the rest.
+
+    CSV rows are counted in raw lines, to match `skip_lines` of the CSV reader.
+    Empty Excel rows are kept, so row indexes match the sheet.
+    """
+    if file_path.lower().endswith(EXCEL_EXTENSIONS):
+        return list(
+            pl.read_excel(
+                source=file_path,
+                has_header=False,
+                read_options={"n_rows": n_rows},
+                drop_empty_rows=False,
+            ).iter_rows()
+        )
+    with open(file_path, encoding="utf-8-sig", errors="replace") as f:
+        lines = list(islice(f, n_rows))
+    return [next(csv.reader([line]), []) for line in lines]
 
 
 class FileBasedCardStatement(ABC):
+    """
+    Base class for statements parsed from a local file.
+
+    `load_data` reads the export and sets `lf` to a lazy query, usually by
+    compiling the statement's `spec` with `sources.spec.apply_spec`. Lazy
+    queries let polars read only the columns that are used and apply the
+    filters while scanning; they are collected once, the first time `get_df` is
+    called, and `skip_rules` (if any) are applied to the collected rows.
+    """
+
     type: str
     file_path: str
-    df: pl.DataFrame
+    df: pl.DataFrame | None = None
+    lf: pl.LazyFrame | None = None
+    # collect lazy queries with the streaming engine, for very large exports
+    streaming: bool = False
+    # number of leading rows searched by `find_header_row`
+    header_search_rows: int = 50
+    # exclusion rules applied when the lazy query is collected
+    skip_rules: SkipRules | None = None
+    # declarative description of the export's columns, see `sources.spec`
+    spec: dict = {}
+    # cheap checks identifying this statement's files, see `matches_signature`:
+    #   extensions - allowed file extensions (default: .csv)
+    #   filename - regex searched in the file name (case-insensitive)
+    #   header - column names that must all appear in one of the leading rows
+    #   column_count - number of fields of the first data row
+    #   date_format - strptime format of the first field of the first data row
+    #   column_patterns - {field index: regex} searched in the first data row
+    signature: dict = {}
 
     pl.Config.set_tbl_cols(20)
     pl.Config.set_tbl_rows(50)
@@ -30,23 +88,161 @@ class FileBasedCardStatement(ABC):
     def load_data(self) -> None:
         pass
 
+    def find_header_row(self, columns: list[str]) -> int:
+        """
+        Find the header row of an export that starts with a preamble.
+
+        Only the first `header_search_rows` rows are read, so the body can then
+        be parsed in a single typed pass starting after the header.
+
+        Args:
+            columns: Column names that must all appear in the header row
+
+        Returns:
+            int: Zero-based index of the header row
+
+        Raises:
+            ValueError: If no searched row contains every column
+        """
+        rows = read_leading_rows(self.file_path, self.header_search_rows)
+        header_row = self._find_row(rows, columns)
+        if header_row is None:
+            raise ValueError(
+                f"Could not find header row with {', '.join(repr(c) for c in columns)}"
+            )
+        return header_row
+
+    @staticmethod
+    def _find_row(rows: list[list], columns: list[str]) -> int | None:
+        """
+        Get the index of the first row containing every column name, if any.
+        """
+        for i, row in enumerate(rows):
+            if all(column in row for column in columns):
+                return i
+        return None
+
+    @classmethod
+    def matches_signature(cls, file_name: str, rows: list[list]) -> bool:
+        """
+        Check whether a file looks like one of this statement's exports.
+
+        Args:
+            file_name: Name of the file
+            rows: Leading rows of the file, see `read_leading_rows`
+
+        Returns:
+            bool: True if every check of `signature` passes
+        """
+        signature = cls.signature
+        if not signature:
+            return False
+        if not file_name.lower().endswith(tuple(signature.get("extensions", [".csv"]))):
+            return False
+        if "filename" in signature and not re.search(
+            signature["filename"], file_name, re.IGNORECASE
+        ):
+            return False
+
+        data_rows = rows
+        if "header" in signature:
+            header_row = cls._find_row(rows, signature["header"])
+            if header_row is None:
+                return False
+            data_rows = rows[header_row + 1 :]
+        data_rows = [
+            row for row in data_rows if any(cell not in (None, "") for cell in row)
+        ]
+        if not data_rows:
+            # a header-only export still identifies the statement
+            return "header" in signature
+        first_row = [
+            None if cell is None else str(cell).strip() for cell in data_rows[0]
+        ]
+
+        if "column_count" in signature and len(first_row) != signature["column_count"]:
+            return False
+        if "date_format" in signature:
+            try:
+                datetime.strptime(first_row[0] or "", signature["date_format"])
+            except ValueError:
+                return False
+        for index, pattern in signature.get("column_patterns", {}).items():
+            if index >= len(first_row) or not re.search(
+                pattern, first_row[index] or ""
+            ):
+                return False
+        return True
+
     def get_df(self) -> pl.DataFrame:
+        if self.df is None and self.lf is not None:
+            df = self.lf.collect(engine="streaming" if self.streaming else "auto")
+            if self.skip_rules is not None:
+                df = self.skip_rules.apply(df)
+            self.df = df
         return self.df
 
 
 class OnlineCardStatement(ABC):
+    """
+    Base class for statements fetched from an online account.
+
+    The activity is read through `transport`, the live client unless the
+    ONLINE_TRANSPORT setting selects a recording, replay or synthetic one (see
+    `sources.api.transport`). When `since` is set, only the activity on or
+    after that date is kept (see `services.sync_state`).
+    """
+
     type: str
     df: pl.DataFrame
     config: Config
+    since: date | None
+    transport: ActivityTransport
+    # fields of each activity entry kept by `collect_activity`
+    activity_fields: list[str] = []
 
-    def __init__(self, type: str):
+    def __init__(
+        self,
+        type: str,
+        since: date | None = None,
+        transport: ActivityTransport | None = None,
+    ):
         self.type = type
+        self.since = since
         self.config = Config(debug=True)
+        self.transport = transport or get_transport(self.config.online_transport)
         self.load_data()
 
     @abstractmethod
     def load_data(self) -> None:
         pass
 
+    def collect_activity(self, activity: Iterable[dict]) -> pl.DataFrame:
+        """
+        Build a DataFrame from activity entries listed newest first.
+
+        The entries are appended field by field to one list per column instead
+        of building the frame from a list of dicts. Reading stops at the first
+        entry older than `since`, so a lazily paged feed is not fetched past the
+        activity that was already synced.
+
+        Args:
+            activity: Activity entries with an ISO formatted "date" field
+
+        Returns:
+            pl.DataFrame: One string column per field of `activity_fields`
+        """
+        since = self.since.isoformat() if self.since is not None else None
+        columns: dict[str, list] = {field: [] for field in self.activity_fields}
+        for entry in activity:
+            if since is not None and entry["date"][:10] < since:
+                print(f"Reached activity older than {since}, stopping")
+                break
+            for field, values in columns.items():
+                values.append(entry.get(field))
+        return pl.DataFrame(
+            columns, schema={field: pl.Utf8 for field in self.activity_fields}
+        )
+
     def get_df(self) -> pl.DataFrame:
         return self.df
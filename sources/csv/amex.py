@@ -1,9 +1,30 @@
 import polars as pl
 
-from sources.base import FileBasedCardStatement
+from sources.base import EXCEL_EXTENSIONS, FileBasedCardStatement
+from sources.spec import apply_spec
+from utils.excel_cache import ExcelCache
 
 
 class AmexStatement(FileBasedCardStatement):
+    signature = {
+        "extensions": EXCEL_EXTENSIONS,
+        "header": ["Date", "Description", "Amount"],
+    }
+    # months of up to 3 letters are written without a period ("May"), longer ones
+    # are abbreviated with one ("Apr.")
+    spec = {
+        "date": "column_1",
+        "date_formats": ["%d %b. %Y", "%d %b %Y"],
+        # rows without a date are not transactions
+        "require_date": True,
+        "merchant": "column_2",
+        "cost": "column_5",
+        "amount_strip": "$,",
+        "amount_decimal": True,
+        # bill payments to Amex are not expenses
+        "exclude": [{"pattern": "PAYMENT RECEIVED - THANK YOU"}],
+    }
+
     def __init__(self, file_path: str):
         super().__init__(type="amex", file_path=file_path)
 
@@ -24,74 +45,47 @@ class AmexStatement(FileBasedCardStatement):
         Raises:
             ValueError: If the file doesn't exist or required headers can't be found
         """
-        df = pl.read_excel(source=self.file_path, has_header=False)
-
         # Find the header row that contains 'Date', 'Description', 'Amount'
-        header_row = None
-        for i, row in enumerate(df.iter_rows()):
-            if "Date" in row and "Description" in row and "Amount" in row:
-                header_row = i
-                break
-
-        if header_row is None:
-            raise ValueError(
-                "Could not find header row with 'Date', 'Description', 'Amount'"
-            )
-
-        # Filter rows after the header row and drop unnecessary columns
-        df1 = (
-            df.with_row_index()
-            .filter(pl.col("index") > header_row)
-            .drop("index", "column_3")
-        )
-
-        # Rename columns to more normalized names
-        df2 = df1.rename(
-            {
-                "column_1": "date",
-                "column_2": "merchant",
-                "column_5": "cost",
-            }
-        )
-        # Add a dummy cc_category column with None values
-        df3 = df2.with_columns(pl.lit(None).alias("cc_category"))
-
-        # Convert date strings to date objects with handling for both formats
-        # For months with 3 letters or less (e.g., "May"), use "%d %b %Y"
-        # For months with more than 3 letters (e.g., "Apr."), use "%d %b. %Y"
-        # Filter dates with period (e.g., "Apr.") and convert them
-        df_with_period = df3.filter(pl.col("date").str.contains(r"\. "))
-        df_with_period = df_with_period.with_columns(
-            pl.col("date").str.to_date(format="%d %b. %Y")
-        )
-
-        # Filter dates without period (e.g., "May") and convert them
-        df_without_period = df3.filter(~pl.col("date").str.contains(r"\. "))
-        df_without_period = df_without_period.with_columns(
-            pl.col("date").str.to_date(format="%d %b %Y")
-        )
-
-        # Union the two dataframes
-        df4 = pl.concat([df_with_period, df_without_period])
-
-        # Convert amount strings to decimal numbers, removing dollar signs and commas
-        df5 = df4.with_columns(
-            pl.col("cost")
-            .str.replace(r"\$", "")
-            .str.replace(",", "")
-            .str.to_decimal(scale=2)
-        )
-
-        # Filter out rows where merchant is "PAYMENT RECEIVED - THANK YOU"
-        # This is a bill payment to Amex, not an expense
-        df6 = df5.filter(
-            ~pl.col("merchant").str.contains("PAYMENT RECEIVED - THANK YOU")
+        header_row = self.find_header_row(["Date", "Description", "Amount"])
+
+        # Read only the rows after the header row, reusing the decoded sheet of
+        # an unchanged workbook from the cache
+        lf = ExcelCache().read_excel(
+            self.file_path,
+            has_header=False,
+            read_options={"skip_rows": header_row + 1},
+            schema_overrides={
+                "column_1": pl.Utf8,
+                "column_2": pl.Utf8,
+                "column_5": pl.Utf8,
+            },
         )
 
-        self.df = df6
+        self.lf = apply_spec(lf, self.spec)
 
 
 class AmexAnnualStatement(FileBasedCardStatement):
+    signature = {
+        "header": [
+            "Category",
+            "Card Member",
+            "Date",
+            "Month-Billed",
+            "Transaction",
+            "Charges $",
+            "Credits $",
+        ]
+    }
+    spec = {
+        "date": "Date",
+        "date_formats": ["%d/%m/%Y"],
+        "merchant": "Transaction",
+        "cost": "Charges $",
+        "credit": "Credits $",
+        "amount_strip": ",",
+        "amount_decimal": True,
+    }
+
     def __init__(self, file_path: str):
         super().__init__(type="amex_annual", file_path=file_path)
 
@@ -110,27 +104,5 @@ class AmexAnnualStatement(FileBasedCardStatement):
             "Charges $": pl.Utf8,
             "Credits $": pl.Utf8,
         }
-        df = pl.read_csv(source=self.file_path, has_header=True, schema=schema)
-        df = df.with_columns(pl.col("Date").str.to_date(format="%d/%m/%Y"))
-        df = df.with_columns(
-            pl.col("Charges $").str.replace(",", "").str.to_decimal(scale=2)
-        )
-        df = df.with_columns(
-            pl.col("Credits $").str.replace(",", "").str.to_decimal(scale=2)
-        )
-
-        # merge Charges $ and Credits $, but credits should be negative
-        df = df.with_columns(pl.col("Credits $").mul(-1))
-        df = df.with_columns(
-            pl.coalesce(pl.col("Charges $"), pl.col("Credits $")).alias("cost")
-        )
-        df = df.select("Date", "Transaction", "cost")
-        df = df.rename(
-            {
-                "Date": "date",
-                "Transaction": "merchant",
-            }
-        )
-        df = df.with_columns(pl.lit(None).alias("cc_category"))
-
-        self.df = df
+        lf = pl.scan_csv(source=self.file_path, has_header=True, schema=schema)
+        self.lf = apply_spec(lf, self.spec)
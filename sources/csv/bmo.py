@@ -1,9 +1,20 @@
 import polars as pl
 
 from sources.base import FileBasedCardStatement
+from sources.spec import apply_spec
 
 
 class BMOStatement(FileBasedCardStatement):
+    signature = {"header": ["Posting Date", "Description", "Transaction Amount"]}
+    spec = {
+        "date": "column_3",
+        "date_formats": ["%Y%m%d"],
+        "merchant": "column_6",
+        "cost": "column_5",
+        # negative amounts are payments and refunds, we only want expenses
+        "require": "positive",
+    }
+
     def __init__(self, file_path: str):
         super().__init__(type="bmo", file_path=file_path)
 
@@ -24,49 +35,21 @@ class BMOStatement(FileBasedCardStatement):
         Raises:
             ValueError: If the file doesn't exist or required headers can't be found
         """
-        df = pl.read_csv(source=self.file_path, has_header=False)
-
-        # Find the header row that contains 'Date', 'Description', 'Amount'
-        header_row = None
-        for i, row in enumerate(df.iter_rows()):
-            if (
-                "Posting Date" in row
-                and "Description" in row
-                and "Transaction Amount" in row
-            ):
-                header_row = i
-                break
-
-        if header_row is None:
-            raise ValueError(
-                "Could not find header row with 'Posting Date', 'Description', 'Transaction Amount'"
-            )
-
-        # Filter rows after the header row and drop unnecessary columns
-        df1 = (
-            df.with_row_index()
-            .filter(pl.col("index") > header_row)
-            .drop("index", "column_1", "column_2", "column_4")
+        # Find the header row that contains 'Posting Date', 'Description', 'Transaction Amount'
+        header_row = self.find_header_row(
+            ["Posting Date", "Description", "Transaction Amount"]
         )
 
-        # Rename columns to more normalized names
-        df2 = df1.rename(
-            {
-                "column_3": "date",
-                "column_6": "merchant",
-                "column_5": "cost",
-            }
+        # Scan only the rows after the header row
+        lf = pl.scan_csv(
+            source=self.file_path,
+            has_header=False,
+            skip_lines=header_row + 1,
+            schema_overrides={
+                "column_3": pl.Utf8,
+                "column_5": pl.Decimal(38, 2),
+                "column_6": pl.Utf8,
+            },
         )
-        # Add a dummy cc_category column with None values
-        df3 = df2.with_columns(pl.lit(None).alias("cc_category"))
-
-        # Convert date strings to date objects
-        df4 = df3.with_columns(pl.col("date").str.to_date(format="%Y%m%d"))
-
-        # Convert amount strings to decimal numbers, removing dollar signs and commas
-        df5 = df4.with_columns(pl.col("cost").str.to_decimal(scale=2))
-
-        # Filter out rows where cost is negative (we only want expenses)
-        df6 = df5.filter(pl.col("cost") > 0)
 
-        self.df = df6
+        self.lf = apply_spec(lf, self.spec)
@@ -1,9 +1,21 @@
 import polars as pl
 
 from sources.base import FileBasedCardStatement
+from sources.spec import apply_spec
 
 
 class CanadianTireStatement(FileBasedCardStatement):
+    signature = {
+        "header": ["REF", "TRANSACTION DATE", "POSTED DATE", "TYPE", "DESCRIPTION"]
+    }
+    # the date column is typed by the CSV reader
+    spec = {
+        "date": "column_2",
+        "merchant": "column_5",
+        "cost": "column_7",
+        "exclude": [{"pattern": "PAYMENT", "column": "column_4", "kind": "exact"}],
+    }
+
     def __init__(self, file_path: str):
         super().__init__(type="canadian_tire", file_path=file_path)
 
@@ -14,56 +26,32 @@ class CanadianTireStatement(FileBasedCardStatement):
         This function reads a CSV file containing Canadian Tire transaction data and transforms
         it into a standardized format for database insertion.
         """
-        df = pl.read_csv(source=self.file_path, has_header=False)
-
         # Find the header row that contains 'REF', 'TRANSACTION DATE', 'POSTED DATE', 'TYPE', 'DESCRIPTION', 'Category', 'AMOUNT'
-        header_row = None
-        for i, row in enumerate(df.iter_rows()):
-            if (
-                "REF" in row
-                and "TRANSACTION DATE" in row
-                and "POSTED DATE" in row
-                and "TYPE" in row
-                and "DESCRIPTION" in row
-                and "Category" in row
-                and "AMOUNT" in row
-            ):
-                header_row = i
-                break
-
-        if header_row is None:
-            raise ValueError(
-                "Could not find header row with 'REF', 'TRANSACTION DATE', 'POSTED DATE', 'TYPE', 'DESCRIPTION', 'Category', 'AMOUNT'"
-            )
-
-        # Filter rows after the header row and drop unnecessary columns
-        df1 = df.with_row_index().filter(pl.col("index") > header_row)
-
-        df1 = (
-            df.with_row_index()
-            .filter(pl.col("index") > header_row)
-            .drop("index", "column_3")
+        header_row = self.find_header_row(
+            [
+                "REF",
+                "TRANSACTION DATE",
+                "POSTED DATE",
+                "TYPE",
+                "DESCRIPTION",
+                "Category",
+                "AMOUNT",
+            ]
         )
 
-        # Filter out rows whose type is payment
-        df2 = df1.filter(pl.col("column_4") != "PAYMENT")
-
-        # Rename columns to more normalized names
-        df3 = df2.rename(
-            {
-                "column_2": "date",
-                "column_5": "merchant",
-                "column_7": "cost",
-            }
+        # Scan only the rows after the header row
+        lf = pl.scan_csv(
+            source=self.file_path,
+            has_header=False,
+            skip_lines=header_row + 1,
+            schema_overrides={
+                "column_1": pl.Utf8,
+                "column_2": pl.Date,
+                "column_4": pl.Utf8,
+                "column_5": pl.Utf8,
+                "column_6": pl.Utf8,
+                "column_7": pl.Decimal(38, 2),
+            },
         )
 
-        # Convert date strings to date objects
-        df4 = df3.with_columns(pl.col("date").str.to_date(format="%Y-%m-%d"))
-
-        # Convert cost strings to decimal numbers
-        df5 = df4.with_columns(pl.col("cost").str.to_decimal(scale=2))
-
-        # add cc_category as None
-        df6 = df5.with_columns(pl.lit(None).alias("cc_category"))
-
-        self.df = df6
+        self.lf = apply_spec(lf, self.spec)
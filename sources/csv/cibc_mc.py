@@ -1,9 +1,27 @@
 import polars as pl
 
 from sources.base import FileBasedCardStatement
+from sources.spec import apply_spec
 
 
 class CibcMcStatement(FileBasedCardStatement):
+    # no header row; the last column is the masked card number
+    signature = {
+        "column_count": 5,
+        "date_format": "%Y-%m-%d",
+        "column_patterns": {4: r"^\d*\*+\d+$"},
+    }
+    spec = {
+        "date": "column_1",
+        "date_formats": ["%Y-%m-%d"],
+        "merchant": "column_2",
+        "cost": "column_3",
+        # payments appear in the credit column with "PAYMENT" in the merchant
+        "exclude": [{"pattern": "PAYMENT"}],
+        # rows without a debit are credits/refunds, we only want expenses
+        "require": "not_null",
+    }
+
     def __init__(self, file_path: str):
         super().__init__(type="cibc_mc", file_path=file_path)
 
@@ -31,32 +49,6 @@ class CibcMcStatement(FileBasedCardStatement):
             Exception: If the file cannot be read or processed
         """
         # Read the CSV file without headers (CIBC CSVs have no header row)
-        df = pl.read_csv(source=self.file_path, has_header=False)
-
-        # Rename columns to normalized names
-        df1 = df.rename(
-            {
-                "column_1": "date",
-                "column_2": "merchant",
-                "column_3": "cost",
-                "column_4": "credit",
-                "column_5": "card_number",
-            }
-        )
-
-        # Convert date strings to date objects (already in YYYY-MM-DD format)
-        df2 = df1.with_columns(pl.col("date").str.to_date(format="%Y-%m-%d"))
-
-        # Filter out payments (they appear in the credit column with "PAYMENT" in merchant)
-        df3 = df2.filter(~(pl.col("merchant").str.contains("PAYMENT")))
-
-        # Filter out rows where cost (debit) is null (we only want expenses, not credits/refunds)
-        df4 = df3.filter(pl.col("cost").is_not_null())
-
-        # Add cc_category as None
-        df5 = df4.with_columns(pl.lit(None).alias("cc_category"))
-
-        # Select only the columns we need
-        df6 = df5.select(["date", "merchant", "cost", "cc_category"])
+        lf = pl.scan_csv(source=self.file_path, has_header=False)
 
-        self.df = df6
+        self.lf = apply_spec(lf, self.spec)
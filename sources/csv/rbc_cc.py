@@ -1,9 +1,24 @@
 import polars as pl
 
 from sources.base import FileBasedCardStatement
+from sources.spec import apply_spec
 
 
 class RbcCcStatement(FileBasedCardStatement):
+    signature = {
+        "header": ["Account Type", "Transaction Date", "Description 1", "CAD$"]
+    }
+    # charges are exported as negative amounts
+    spec = {
+        "date": "Transaction Date",
+        "date_formats": ["%m/%d/%Y"],
+        "merchant": "Description 1",
+        "cost": "CAD$",
+        "negate": True,
+        "amount_dtype": pl.Decimal(10, 2),
+        "exclude": [{"pattern": "PAYMENT - THANK YOU / PAI EMENT - MERCI"}],
+    }
+
     def __init__(self, file_path: str):
         super().__init__(type="rbc_cc", file_path=file_path)
 
@@ -34,38 +49,11 @@ class RbcCcStatement(FileBasedCardStatement):
             "USD$": pl.Decimal(10, 2),
         }
         # Read the CSV file with headers
-        df = pl.read_csv(
+        lf = pl.scan_csv(
             source=self.file_path,
             has_header=True,
             schema=schema,
             truncate_ragged_lines=True,
         )
 
-        df = df.with_columns(
-            pl.col("Transaction Date").str.strptime(pl.Date, "%m/%d/%Y")
-        )
-
-        # Rename columns to normalized names
-        df1 = df.rename(
-            {"Transaction Date": "date", "Description 1": "merchant", "CAD$": "cost"}
-        )
-
-        # Select only the columns we need
-        df2 = df1.select(["date", "merchant", "cost"])
-
-        # add cc_category as None
-        df3 = df2.with_columns(pl.lit(None).alias("cc_category"))
-
-        # mult by -1
-        df4 = df3.with_columns(pl.col("cost").mul(-1).cast(pl.Decimal(10, 2)))
-
-        # ignore transactions
-        df4 = df4.filter(
-            ~(
-                pl.col("merchant").str.contains(
-                    "PAYMENT - THANK YOU / PAI EMENT - MERCI"
-                )
-            )
-        )
-
-        self.df = df4
+        self.lf = apply_spec(lf, self.spec)
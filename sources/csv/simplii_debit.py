@@ -1,9 +1,25 @@
 import polars as pl
 
 from sources.base import FileBasedCardStatement
+from sources.ref_data import skip_rules_ref
+from sources.spec import apply_spec
+from utils.skip_rules import SkipRules
 
 
 class SimpliiDebitStatement(FileBasedCardStatement):
+    skip_rules = SkipRules("simplii_debit", skip_rules_ref["simplii_debit"])
+
+    # same export format as Simplii Visa, so auto-detection reports both
+    signature = {"header": ["Date", " Transaction Details", " Funds Out"]}
+    spec = {
+        "date": "Date",
+        "date_formats": ["%m/%d/%Y"],
+        "merchant": " Transaction Details",
+        "cost": " Funds Out",
+        # rows without funds out are deposits, we only want expenses
+        "require": "not_null",
+    }
+
     def __init__(self, file_path: str):
         super().__init__(type="simplii_debit", file_path=file_path)
 
@@ -24,41 +40,6 @@ class SimpliiDebitStatement(FileBasedCardStatement):
         Raises:
             ValueError: If the file doesn't exist or required headers can't be found
         """
-        df = pl.read_csv(source=self.file_path, has_header=True)
-
-        # Rename columns to more normalized names
-        df2 = df.rename(
-            {
-                "Date": "date",
-                " Transaction Details": "merchant",
-                " Funds Out": "cost",
-            }
-        ).select(
-            "date",
-            "merchant",
-            "cost",
-        )
-        # Add a dummy cc_category column with None values
-        df3 = df2.with_columns(pl.lit(None).alias("cc_category"))
-
-        # Convert date strings to date objects
-        df4 = df3.with_columns(pl.col("date").str.to_date(format="%m/%d/%Y"))
-
-        # Filter out rows where cost is null (we only want expenses)
-        df6 = df4.filter(pl.col("cost").is_not_null())
-
-        # Define list of merchants to skip
-        skip_merchants = [
-            "bill payment",
-            "MISCELLANEOUS PAYMENTS Wise Canada",
-            "INTERAC E-TRANSFER SEND nathan wealthsimple",
-        ]
-
-        # filter out transactions from skip list
-        df7 = df6
-        for merchant in skip_merchants:
-            df7 = df7.filter(
-                ~(pl.col("merchant").str.to_lowercase().str.contains(merchant.lower()))
-            )
+        lf = pl.scan_csv(source=self.file_path, has_header=True)
 
-        self.df = df7
+        self.lf = apply_spec(lf, self.spec)
@@ -2,9 +2,21 @@ import polars as pl
 
 from sources.base import FileBasedCardStatement
 from sources.ref_data import simplii_visa_cc_merchant_name_to_category_ref
+from sources.spec import apply_spec
 
 
 class SimpliiVisaStatement(FileBasedCardStatement):
+    # same export format as Simplii Debit, so auto-detection reports both
+    signature = {"header": ["Date", " Transaction Details", " Funds Out"]}
+    spec = {
+        "date": "Date",
+        "date_formats": ["%m/%d/%Y"],
+        "merchant": " Transaction Details",
+        "cost": " Funds Out",
+        # rows without funds out are deposits, we only want expenses
+        "require": "not_null",
+    }
+
     def __init__(self, file_path: str):
         super().__init__(type="simplii_visa", file_path=file_path)
 
@@ -25,26 +37,9 @@ class SimpliiVisaStatement(FileBasedCardStatement):
         Raises:
             ValueError: If the file doesn't exist or required headers can't be found
         """
-        df = pl.read_csv(source=self.file_path, has_header=True)
-
-        # Rename columns to more normalized names
-        df2 = df.rename(
-            {
-                "Date": "date",
-                " Transaction Details": "merchant",
-                " Funds Out": "cost",
-            }
-        )
-        # Add a dummy cc_category column with None values
-        df3 = df2.with_columns(pl.lit(None).alias("cc_category"))
-
-        # Convert date strings to date objects
-        df4 = df3.with_columns(pl.col("date").str.to_date(format="%m/%d/%Y"))
-
-        # Filter out rows where cost is null (we only want expenses)
-        df6 = df4.filter(pl.col("cost").is_not_null())
-
-        self.df = df6
+        lf = pl.scan_csv(source=self.file_path, has_header=True)
+
+        self.lf = apply_spec(lf, self.spec)
 
     @staticmethod
     def auto_match_category() -> tuple[str, str]:
@@ -1,9 +1,30 @@
 import polars as pl
 
 from sources.base import FileBasedCardStatement
+from sources.ref_data import skip_rules_ref
+from sources.spec import apply_spec
+from utils.skip_rules import SkipRules
 
 
 class TdDebitStatement(FileBasedCardStatement):
+    # transfers, bill payments, deposits, etc. are not expenses
+    skip_rules = SkipRules("td_debit", skip_rules_ref["td_debit"])
+
+    # no header row; the last column is the running balance
+    signature = {
+        "column_count": 5,
+        "date_format": "%Y-%m-%d",
+        "column_patterns": {4: r"^-?[\d,]*\.?\d+$"},
+    }
+    # debits are expenses, credits (income) are kept as negative costs
+    spec = {
+        "date": "column_1",
+        "date_formats": ["%Y-%m-%d"],
+        "merchant": "column_2",
+        "cost": "column_3",
+        "credit": "column_4",
+    }
+
     def __init__(self, file_path: str):
         super().__init__(type="td_debit", file_path=file_path)
 
@@ -31,68 +52,6 @@ class TdDebitStatement(FileBasedCardStatement):
             Exception: If the file cannot be read or processed
         """
         # Read the CSV file without headers (TD CSVs have no header row)
-        df = pl.read_csv(source=self.file_path, has_header=False)
-
-        # Rename columns to normalized names
-        df1 = df.rename(
-            {
-                "column_1": "date",
-                "column_2": "merchant",
-                "column_3": "credit",
-                "column_4": "debit",
-                "column_5": "balance",
-            }
-        )
-
-        # Convert date strings to date objects (already in YYYY-MM-DD format)
-        df2 = df1.with_columns(pl.col("date").str.to_date(format="%Y-%m-%d"))
-
-        # Make debit amounts negative and coalesce with credits (debits are expenses, credits are income)
-        df3 = df2.with_columns(
-            pl.coalesce([pl.col("credit"), -pl.col("debit")]).alias("cost")
-        )
-
-        # Define list of merchant patterns to skip (transfers, fees, mortgage, etc.)
-        skip_merchants = [
-            "TFR-TO",  # Transfers to other accounts
-            "TFR-FR",  # Transfers from other accounts
-            # "SEND E-TFR",  # E-transfers sent
-            "E-TRANSFER",  # E-transfers received (in debit column when reversed)
-            "PYT TO:",  # Bill payments
-            # "TD MORTGAGE",  # Mortgage payments
-            # "TD ATM W/D",  # ATM withdrawals
-            # "CASH WITHDRAWAL",  # Cash withdrawals
-            # "OVERDRAFT INTEREST",  # Bank fees
-            # "O.D.P. FEE",  # Overdraft protection fee
-            # "MONTHLY ACCOUNT FEE",  # Monthly fees
-            # "FEE REBATE",  # Fee rebates
-            # "NSF PAID FEE",  # NSF fees
-            "MOBILE DEPOSIT",  # Mobile deposits
-            "RICHMOND HILL C  PAY",
-            "MERRY ELECTRONI  PAY",
-            "CDACARBONREBATE",
-            "MANULIFE 729642  HDC",
-            "IG FIN SER SFGI  INV",
-            "ROGRS BNK MC",
-            "CAN TIRE MC",
-            "CIBC MC",
-            "EMPL INS         EI",
-            "CPP              CPP",
-            "TAX REFUND       RIT",
-            "OLD AGE SEC      OAS",
-        ]
-
-        # Filter out transactions from skip list
-        df4 = df3
-        for merchant in skip_merchants:
-            df4 = df4.filter(
-                ~(pl.col("merchant").str.to_uppercase().str.contains(merchant.upper()))
-            )
-
-        # Add cc_category as None
-        df5 = df4.with_columns(pl.lit(None).alias("cc_category"))
-
-        # Select only the columns we need
-        df6 = df5.select(["date", "merchant", "cost", "cc_category"])
+        lf = pl.scan_csv(source=self.file_path, has_header=False)
 
-        self.df = df6
+        self.lf = apply_spec(lf, self.spec)
@@ -1,9 +1,23 @@
 import polars as pl
 
 from sources.base import FileBasedCardStatement
+from sources.spec import apply_spec
 
 
 class TdVisaStatement(FileBasedCardStatement):
+    # no header row
+    signature = {"column_count": 5, "date_format": "%m/%d/%Y"}
+    # payments and refunds in the credit column are kept as negative costs
+    spec = {
+        "date": "column_1",
+        "date_formats": ["%m/%d/%Y"],
+        "merchant": "column_2",
+        "cost": "column_3",
+        "credit": "column_4",
+        "amount_dtype": pl.Float64,
+        "exclude": [{"pattern": "PAYMENT"}, {"pattern": "REWARDS REDEMPTION"}],
+    }
+
     def __init__(self, file_path: str):
         super().__init__(type="td_visa", file_path=file_path)
 
@@ -31,45 +45,6 @@ class TdVisaStatement(FileBasedCardStatement):
             Exception: If the file cannot be read or processed
         """
         # Read the CSV file without headers (TD Visa CSVs have no header row)
-        df = pl.read_csv(source=self.file_path, has_header=False)
-
-        # Rename columns to normalized names
-        df1 = df.rename(
-            {
-                "column_1": "date",
-                "column_2": "merchant",
-                "column_3": "cost",
-                "column_4": "credit",
-                "column_5": "balance",
-            }
-        )
-
-        # Convert date strings to date objects
-        df2 = df1.with_columns(pl.col("date").str.to_date(format="%m/%d/%Y"))
-
-        # Filter out payments (they appear in the credit column with "PAYMENT" in merchant)
-        df3 = df2.filter(
-            ~(pl.col("merchant").str.contains("PAYMENT"))
-            & ~(pl.col("merchant").str.contains("REWARDS REDEMPTION"))
-        )
-
-        # turn the credit column to negative
-        df4 = df3.with_columns(pl.col("credit").cast(pl.Float64).neg())
-
-        # coalesce cost and credit to a single column
-        df5 = df4.with_columns(
-            pl.coalesce(
-                pl.col("cost").cast(pl.Float64), pl.col("credit").cast(pl.Float64)
-            ).alias("new_cost")
-        )
-
-        # Add cc_category as None
-        df6 = df5.with_columns(pl.lit(None).alias("cc_category"))
-
-        # Select only the columns we need
-        df7 = df6.select(["date", "merchant", "new_cost", "cc_category"])
-
-        # rename
-        df8 = df7.rename({"new_cost": "cost"})
+        lf = pl.scan_csv(source=self.file_path, has_header=False)
 
-        self.df = df8
+        self.lf = apply_spec(lf, self.spec)
@@ -22,3 +22,126 @@ reimbursement_merchant_ref: list[str] = [
 simplii_visa_cc_merchant_name_to_category_ref: dict[str, tuple[str, str]] = {
     "Restaurants": ("Food", "Eating Out"),
 }
+
+# Transactions dropped before loading, per source. Each rule matches `pattern`
+# against `column` (default "merchant"):
+#   kind "literal" (default) - substring, "exact" - whole value, "regex" - pattern
+#   ignore_case - compare case-insensitively
+#   type - only apply to rows whose "type" column has this value
+skip_rules_ref: dict[str, list[dict]] = {
+    "td_debit": [
+        {"pattern": "TFR-TO", "ignore_case": True},  # Transfers to other accounts
+        {"pattern": "TFR-FR", "ignore_case": True},  # Transfers from other accounts
+        # {"pattern": "SEND E-TFR", "ignore_case": True},  # E-transfers sent
+        # E-transfers received (in debit column when reversed)
+        {"pattern": "E-TRANSFER", "ignore_case": True},
+        {"pattern": "PYT TO:", "ignore_case": True},  # Bill payments
+        # {"pattern": "TD MORTGAGE", "ignore_case": True},  # Mortgage payments
+        # {"pattern": "TD ATM W/D", "ignore_case": True},  # ATM withdrawals
+        # {"pattern": "CASH WITHDRAWAL", "ignore_case": True},  # Cash withdrawals
+        # {"pattern": "OVERDRAFT INTEREST", "ignore_case": True},  # Bank fees
+        # {"pattern": "O.D.P. FEE", "ignore_case": True},  # Overdraft protection fee
+        # {"pattern": "MONTHLY ACCOUNT FEE", "ignore_case": True},  # Monthly fees
+        # {"pattern": "FEE REBATE", "ignore_case": True},  # Fee rebates
+        # {"pattern": "NSF PAID FEE", "ignore_case": True},  # NSF fees
+        {"pattern": "MOBILE DEPOSIT", "ignore_case": True},  # Mobile deposits
+        {"pattern": "RICHMOND HILL C  PAY", "ignore_case": True},
+        {"pattern": "MERRY ELECTRONI  PAY", "ignore_case": True},
+        {"pattern": "CDACARBONREBATE", "ignore_case": True},
+        {"pattern": "MANULIFE 729642  HDC", "ignore_case": True},
+        {"pattern": "IG FIN SER SFGI  INV", "ignore_case": True},
+        {"pattern": "ROGRS BNK MC", "ignore_case": True},
+        {"pattern": "CAN TIRE MC", "ignore_case": True},
+        {"pattern": "CIBC MC", "ignore_case": True},
+        {"pattern": "EMPL INS         EI", "ignore_case": True},
+        {"pattern": "CPP              CPP", "ignore_case": True},
+        {"pattern": "TAX REFUND       RIT", "ignore_case": True},
+        {"pattern": "OLD AGE SEC      OAS", "ignore_case": True},
+    ],
+    "simplii_debit": [
+        {"pattern": "bill payment", "ignore_case": True},
+        {"pattern": "MISCELLANEOUS PAYMENTS Wise Canada", "ignore_case": True},
+        {"pattern": "INTERAC E-TRANSFER SEND nathan wealthsimple", "ignore_case": True},
+    ],
+    "ws_debit": [
+        *[
+            {"column": "type", "pattern": activity_type, "kind": "exact"}
+            for activity_type in [
+                "Chequing",
+                "Visa Infinite",
+                "Direct deposit",
+                "Electronic funds transfer",
+            ]
+        ],
+        # in pre-authorized debit, ignore AMEX BILL PYMT
+        *[
+            {
+                "column": "description",
+                "pattern": description,
+                "kind": "exact",
+                "type": "Pre-authorized debit",
+            }
+            for description in ["AMEX BILL PYMT", "Coinbase", "CDN TIRE", "AMEX"]
+        ],
+        # in bill pay, ignore BMO MASTERCARD and ROGERS BANK-MASTERCARD
+        *[
+            {
+                "column": "description",
+                "pattern": description,
+                "kind": "exact",
+                "type": "Bill pay",
+            }
+            for description in [
+                "BMO MASTERCARD",
+                "ROGERS BANK-MASTERCARD",
+                "VISA ROYAL BANK",
+                "SIMPLII FINANCIAL CASH BACK VISA",
+                "Triangle MC",
+                "BRIM FINANCIAL",
+                "Amazon MBNA",
+            ]
+        ],
+        # ignore Interac e-Transfer: Nathan Li Simplii
+        *[
+            {
+                "column": "description",
+                "pattern": description,
+                "kind": "exact",
+                "type": "Interac e-Transfer",
+            }
+            for description in [
+                "Nathan Li Simplii",
+                "Nathan Li",
+                "NATHAN CHI CHUNG LI",
+                "NDAX PAYMENT",
+                "KIT MEI TONG",
+                "Nathan Li EQ Bank",
+                "Simplii Nathan",
+            ]
+        ],
+        {
+            "column": "description",
+            "pattern": "Wealthsimple credit card",
+            "kind": "exact",
+            "type": "Credit card payment",
+        },
+    ],
+    # parents_finance excel workbooks: transfers that are deleted if they exist
+    "excel_transfer": [
+        {"column": "cc_sub_category", "pattern": "Tfr="},
+        {"column": "cc_sub_category", "pattern": "TFR-TO"},
+    ],
+    # transfers in chequing account workbooks
+    "excel_chequing": [
+        {"column": "cc_sub_category", "pattern": "Tfr-"},
+        {"column": "cc_sub_category", "pattern": "TFR-TO"},
+    ],
+    "excel_merchant": [
+        {"pattern": "LOAN PAYMENT"},
+        {"pattern": "IG FIN SER SFGI  INV"},
+        {"pattern": "IG FIN SER SFGI INV"},
+        {"pattern": "WH000 TFR-TO 4109633"},  # td account transfers
+        {"pattern": "WH005 TFR-TO 4116036"},
+        {"pattern": "WH055 TFR-TO C/C"},  # chequing account transfers to credit card
+    ],
+}
@@ -5,8 +5,20 @@ This module provides a single source of truth for card type definitions,
 eliminating the need to update multiple locations when adding new card types.
 """
 
+import os
 from importlib import import_module
 
+from sources.base import read_leading_rows
+
+# --type value that detects the card type of each file from its contents
+AUTO_CARD_TYPE = "auto"
+# --type value that fetches every online source at once
+ONLINE_CARD_TYPE = "online"
+# --type value that processes every source listed in a plan file
+PLAN_CARD_TYPE = "all"
+# number of leading rows read to detect a file's card type
+DETECTION_ROWS = 50
+
 # Card type registry with metadata
 CARD_TYPES = {
     "amex": {
@@ -80,12 +92,16 @@ CARD_TYPES = {
         "class_name": "WealthsimpleDebitStatement",
         "requires_file": False,
         "description": "Wealthsimple Debit",
+        # seconds to wait for the activity to be fetched
+        "timeout": 300,
     },
     "ws_credit": {
         "module": "sources.api.wealthsimple_credit",
         "class_name": "WealthsimpleCreditStatement",
         "requires_file": False,
         "description": "Wealthsimple Credit",
+        # seconds to wait for the activity to be fetched
+        "timeout": 300,
     },
 }
 
@@ -105,6 +121,11 @@ def get_online_card_types() -> set[str]:
     return {name for name, config in CARD_TYPES.items() if not config["requires_file"]}
 
 
+def get_fetch_timeout(card_type: str) -> float | None:
+    """Get the number of seconds to wait for an online source, None to wait forever."""
+    return CARD_TYPES[card_type].get("timeout")
+
+
 def get_card_class(card_type: str):
     """
     Get the statement class for a given card type.
@@ -144,3 +165,36 @@ def requires_file(card_type: str) -> bool:
     if card_type not in CARD_TYPES:
         raise ValueError(f"Invalid card type: {card_type}")
     return CARD_TYPES[card_type]["requires_file"]
+
+
+def detect_card_type(file_path: str) -> str:
+    """
+    Detect the card type of a statement file from its leading rows.
+
+    Every file-based statement class checks its `signature` against the first
+    `DETECTION_ROWS` rows of the file.
+
+    Args:
+        file_path: Path to the statement file
+
+    Returns:
+        The card type identifier
+
+    Raises:
+        ValueError: If no card type, or more than one, matches the file
+    """
+    file_name = os.path.basename(file_path)
+    rows = read_leading_rows(file_path, DETECTION_ROWS)
+    matches = sorted(
+        card_type
+        for card_type in get_file_based_card_types()
+        if get_card_class(card_type).matches_signature(file_name, rows)
+    )
+    if not matches:
+        raise ValueError(f"Could not detect the card type of {file_name}")
+    if len(matches) > 1:
+        raise ValueError(
+            f"{file_name} matches several card types ({', '.join(matches)}), "
+            f"load it with an explicit --type"
+        )
+    return matches[0]
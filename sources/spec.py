@@ -0,0 +1,130 @@
+"""
+Statement Spec - Declarative description of a statement export.
+
+This module compiles a statement spec (which source columns hold the date,
+merchant and amount, how they are formatted and which rows are excluded) into
+a single lazy polars plan, so every source shares the same normalization code.
+
+Spec keys:
+    date: Source column holding the transaction date
+    date_formats: strptime formats tried in order; omit when the reader already
+        parsed the column as a date. A date matching none of them is an error
+    require_date: Drop rows without a date
+    merchant: Source column holding the merchant name
+    cost: Source column holding the amount charged
+    credit: Source column holding credits; used, negated, where cost is null
+    amount_strip: Characters removed from amount strings before parsing
+    amount_decimal: Parse amount strings as decimals with 2 decimal places
+    amount_dtype: Type the amounts and the final cost are cast to
+    negate: Flip the sign of the cost (exports that show charges as negative)
+    cc_category: Source column holding the card's own category, if any
+    clean_text: Replace non-breaking spaces and strip the text columns
+    exclude: Skip rules (see `utils.skip_rules`) evaluated on the source
+        columns; rules without a column apply to the merchant column
+    require: "not_null" to keep rows with a cost, "positive" to keep rows with a
+        cost above zero
+"""
+
+import re
+
+import polars as pl
+
+from utils.skip_rules import SkipRules
+
+OUTPUT_COLUMNS = ["date", "merchant", "cost", "cc_category"]
+
+
+def _date_expr(spec: dict) -> pl.Expr:
+    """
+    Parse the date column, trying each format in order.
+    """
+    column = pl.col(spec["date"])
+    formats = spec.get("date_formats", [])
+    if not formats:
+        return column
+    if len(formats) == 1:
+        return column.str.to_date(format=formats[0])
+    parsed = pl.coalesce(
+        column.str.to_date(format=date_format, strict=False) for date_format in formats
+    )
+    # dates matching none of the formats fail loudly, like a single strict format
+    unparsed = pl.when(parsed.is_null()).then(column)
+    return pl.coalesce(parsed, unparsed.str.to_date(format=formats[0]))
+
+
+def _amount_expr(spec: dict, column: str) -> pl.Expr:
+    """
+    Parse an amount column according to the spec.
+    """
+    expr = pl.col(column)
+    if spec.get("amount_strip"):
+        characters = "".join(re.escape(c) for c in spec["amount_strip"])
+        expr = expr.str.replace_all(f"[{characters}]", "")
+    if spec.get("amount_decimal"):
+        expr = expr.str.to_decimal(scale=2)
+    if "amount_dtype" in spec:
+        expr = expr.cast(spec["amount_dtype"])
+    return expr
+
+
+def _text_expr(spec: dict, column: str) -> pl.Expr:
+    """
+    Select a text column, cleaning it if the spec asks to.
+    """
+    expr = pl.col(column)
+    if spec.get("clean_text"):
+        expr = expr.str.replace_all("\u00a0", " ").str.strip_chars()
+    return expr
+
+
+def apply_spec(lf: pl.LazyFrame, spec: dict) -> pl.LazyFrame:
+    """
+    Compile a statement spec into a lazy plan over the source rows.
+
+    Args:
+        lf: Source rows as read from the export
+        spec: Statement spec, see the module docstring
+
+    Returns:
+        pl.LazyFrame: Plan producing the date, merchant, cost and cc_category
+        columns
+    """
+    # 1. drop excluded rows in one filter over the source columns. Rows where a
+    # rule's column is null are dropped too, as a plain polars filter would.
+    exclude = [
+        SkipRules.compile_rule({"column": spec["merchant"], **rule})
+        for rule in spec.get("exclude", [])
+    ]
+    if exclude:
+        lf = lf.filter(~pl.any_horizontal(exclude))
+
+    # 2. normalize every column in a single select
+    cost = _amount_expr(spec, spec["cost"])
+    if "credit" in spec:
+        cost = pl.coalesce(cost, -_amount_expr(spec, spec["credit"]))
+    if spec.get("negate"):
+        cost = -cost
+    if "amount_dtype" in spec:
+        cost = cost.cast(spec["amount_dtype"])
+    if "cc_category" in spec:
+        cc_category = _text_expr(spec, spec["cc_category"])
+    else:
+        cc_category = pl.lit(None)
+    lf = lf.select(
+        _date_expr(spec).alias("date"),
+        _text_expr(spec, spec["merchant"]).alias("merchant"),
+        cost.alias("cost"),
+        cc_category.alias("cc_category"),
+    )
+
+    # 3. keep expenses only
+    if spec.get("require_date"):
+        lf = lf.filter(pl.col("date").is_not_null())
+    require = spec.get("require")
+    if require == "not_null":
+        lf = lf.filter(pl.col("cost").is_not_null())
+    elif require == "positive":
+        lf = lf.filter(pl.col("cost") > 0)
+    elif require is not None:
+        raise ValueError(f"Unknown spec requirement {require!r}")
+    return lf
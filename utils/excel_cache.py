@@ -0,0 +1,137 @@
+"""
+Excel Cache - Decode each workbook once and reuse it as Arrow IPC.
+
+This module provides a class that caches the decoded sheet of an Excel
+workbook as an Arrow IPC file keyed by the workbook's content hash and the
+read options, so later runs memory-map the columnar copy instead of decoding
+the XLSX again.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from io import BytesIO
+
+import polars as pl
+
+from config import Config
+
+
+class ExcelCache:
+    """
+    Columnar cache of decoded Excel sheets.
+
+    Entries are named after the SHA-256 of the workbook and of the read
+    options, so a workbook that changes (e.g. a year-to-date export that grows
+    every week) simply misses the cache. The least recently used entries beyond
+    `max_entries` are removed.
+    """
+
+    # number of decoded sheets kept on disk
+    max_entries: int = 32
+
+    def __init__(self, cache_dir: str | None = None):
+        """
+        Initialize excel cache.
+
+        Args:
+            cache_dir: Directory holding the cached sheets, defaults to
+                `Config.excel_cache_dir`
+        """
+        self.cache_dir = cache_dir or Config().excel_cache_dir
+
+    @staticmethod
+    def file_hash(source: str | BytesIO) -> str:
+        """
+        Get the SHA-256 of a file's (or an in-memory workbook's) contents.
+        """
+        if isinstance(source, BytesIO):
+            return hashlib.sha256(source.getbuffer()).hexdigest()
+        digest = hashlib.sha256()
+        with open(source, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def read_excel(
+        self,
+        file_path: str | BytesIO,
+        columns: list[str] | None = None,
+        schema_overrides: dict[str, pl.DataType] | None = None,
+        has_header: bool = True,
+        read_options: dict | None = None,
+    ) -> pl.LazyFrame:
+        """
+        Read a sheet through the cache.
+
+        Arguments are passed to `pl.read_excel` on a cache miss. Only the listed
+        columns are decoded and stored.
+
+        Args:
+            file_path: Path to the Excel workbook, or the workbook's contents
+            columns: Columns to read, all columns if None
+            schema_overrides: Types of the read columns
+            has_header: Whether the first row holds the column names
+            read_options: Options passed to the Excel engine
+
+        Returns:
+            pl.LazyFrame: Memory-mapped scan of the cached sheet
+        """
+        options = json.dumps(
+            {
+                "columns": columns,
+                "schema_overrides": {
+                    name: str(dtype) for name, dtype in (schema_overrides or {}).items()
+                },
+                "has_header": has_header,
+                "read_options": read_options,
+            },
+            sort_keys=True,
+        )
+        options_hash = hashlib.sha256(options.encode()).hexdigest()[:16]
+        cache_path = os.path.join(
+            self.cache_dir, f"{self.file_hash(file_path)}-{options_hash}.arrow"
+        )
+
+        if os.path.exists(cache_path):
+            # mark the entry as recently used
+            os.utime(cache_path)
+        else:
+            df = pl.read_excel(
+                source=file_path,
+                columns=columns,
+                schema_overrides=schema_overrides,
+                has_header=has_header,
+                read_options=read_options,
+            )
+            self._write(df, cache_path)
+        return pl.scan_ipc(cache_path, memory_map=True)
+
+    def _write(self, df: pl.DataFrame, cache_path: str) -> None:
+        """
+        Write a decoded sheet to the cache and evict the oldest entries.
+        The file is renamed into place, so concurrent readers never see a
+        partial entry.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        os.close(fd)
+        try:
+            df.write_ipc(tmp_path)
+            os.replace(tmp_path, cache_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+        entries = sorted(
+            (
+                os.path.join(self.cache_dir, name)
+                for name in os.listdir(self.cache_dir)
+                if name.endswith(".arrow")
+            ),
+            key=os.path.getmtime,
+            reverse=True,
+        )
+        for path in entries[self.max_entries :]:
+            os.remove(path)
@@ -19,7 +19,14 @@ class ProcessingResults:
         self.results = []
         self.failed_files = []
 
-    def add_success(self, file_name: str, inserted: int, total: int) -> None:
+    def add_success(
+        self,
+        file_name: str,
+        inserted: int,
+        total: int,
+        skipped: int = 0,
+        source: str | None = None,
+    ) -> None:
         """
         Record a successful file processing.
 
@@ -27,40 +34,78 @@ class ProcessingResults:
             file_name: Name of the processed file
             inserted: Number of transactions inserted
             total: Total number of transactions in the file
+            skipped: Number of transactions skipped because they already existed
+                or were skipped in review
+            source: Card type the file was loaded as
         """
         self.results.append(
             {
                 "file": file_name,
+                "source": source,
                 "status": "success",
                 "inserted": inserted,
+                "skipped": skipped,
                 "total": total,
             }
         )
 
-    def add_failure(self, file_name: str, error: str) -> None:
+    def add_unchanged(self, file_name: str, source: str | None = None) -> None:
+        """
+        Record a file skipped because it was already loaded unchanged.
+
+        Args:
+            file_name: Name of the skipped file
+            source: Card type of the file
+        """
+        self.results.append(
+            {
+                "file": file_name,
+                "source": source,
+                "status": "unchanged",
+                "inserted": 0,
+                "skipped": 0,
+                "total": 0,
+            }
+        )
+
+    def add_failure(
+        self, file_name: str, error: str, source: str | None = None
+    ) -> None:
         """
         Record a failed file processing.
 
         Args:
             file_name: Name of the failed file
             error: Error message describing the failure
+            source: Card type the file was loaded as
         """
         self.failed_files.append({"file": file_name, "error": error})
         self.results.append(
-            {"file": file_name, "status": "failed", "inserted": 0, "total": 0}
+            {
+                "file": file_name,
+                "source": source,
+                "status": "failed",
+                "inserted": 0,
+                "skipped": 0,
+                "total": 0,
+            }
         )
 
     def get_total_inserted(self) -> int:
         """Get total number of transactions inserted across all files."""
         return sum(r["inserted"] for r in self.results)
 
+    def get_total_skipped(self) -> int:
+        """Get total number of transactions skipped across all files."""
+        return sum(r["skipped"] for r in self.results)
+
     def get_total_transactions(self) -> int:
         """Get total number of transactions processed across all files."""
         return sum(r["total"] for r in self.results)
 
     def get_successful_count(self) -> int:
-        """Get number of successfully processed files."""
-        return sum(1 for r in self.results if r["status"] == "success")
+        """Get number of successfully processed (or unchanged) files."""
+        return sum(1 for r in self.results if r["status"] in ("success", "unchanged"))
 
     def get_failed_count(self) -> int:
         """Get number of failed files."""
@@ -70,6 +115,22 @@ class ProcessingResults:
         """Check if any files failed to process."""
         return len(self.failed_files) > 0
 
+    @staticmethod
+    def _print_results(results: list[dict], indent: str) -> None:
+        """
+        Print one line per file.
+        """
+        for result in results:
+            if result["status"] == "success":
+                print(
+                    f"{indent}✓ {result['file']}: {result['inserted']}/{result['total']} transactions inserted"
+                    f", {result['skipped']} skipped"
+                )
+            elif result["status"] == "unchanged":
+                print(f"{indent}= {result['file']}: unchanged since it was last loaded")
+            else:
+                print(f"{indent}✗ {result['file']}: FAILED")
+
     def print_summary(self, total_files: int) -> None:
         """
         Print a formatted summary of processing results.
@@ -81,15 +142,22 @@ class ProcessingResults:
         print("PROCESSING SUMMARY")
         print("=" * 80)
 
-        if self.results:
+        # group the files by card type when several were loaded
+        sources = list(dict.fromkeys(r["source"] for r in self.results))
+        if len(sources) > 1:
+            print("\nPer-source breakdown:")
+            for source in sources:
+                source_results = [r for r in self.results if r["source"] == source]
+                print(
+                    f"\n  {source}: "
+                    f"{sum(r['inserted'] for r in source_results)}/"
+                    f"{sum(r['total'] for r in source_results)} transactions inserted"
+                    f", {sum(r['skipped'] for r in source_results)} skipped"
+                )
+                self._print_results(source_results, indent="    ")
+        elif self.results:
             print("\nPer-file breakdown:")
-            for result in self.results:
-                if result["status"] == "success":
-                    print(
-                        f"  ✓ {result['file']}: {result['inserted']}/{result['total']} transactions inserted"
-                    )
-                else:
-                    print(f"  ✗ {result['file']}: FAILED")
+            self._print_results(self.results, indent="  ")
 
         if self.has_failures():
             print(f"\n{self.get_failed_count()} file(s) failed to process:")
@@ -99,5 +167,6 @@ class ProcessingResults:
         print(
             f"\nTotal: {self.get_total_inserted()}/{self.get_total_transactions()} "
             f"transactions inserted from {self.get_successful_count()}/{total_files} file(s)"
+            f", {self.get_total_skipped()} skipped"
         )
         print("=" * 80)
@@ -0,0 +1,116 @@
+"""
+Skip Rules - Drop transactions matching a source's exclusion rules.
+
+This module provides a class that compiles a list of skip rules (see
+`sources.ref_data.skip_rules_ref`) into polars expressions that are all
+evaluated in a single pass, and reports how many rows each rule matched.
+"""
+
+import re
+
+import polars as pl
+
+
+class SkipRules:
+    """
+    Compiled skip rules for one source.
+
+    Each rule is a dict with a `pattern` and optionally a `column` (default
+    "merchant"), a `kind` ("literal" substring, "exact" or "regex"),
+    `ignore_case`, and a `type` restricting the rule to rows of that type.
+    """
+
+    def __init__(self, name: str, rules: list[dict]):
+        """
+        Compile the rules.
+
+        Args:
+            name: Name of the rule set, used when reporting hit counts
+            rules: Rule dicts, see the class docstring
+
+        Raises:
+            ValueError: If a rule has an unknown kind
+        """
+        self.name = name
+        self.rules = rules
+        self.exprs = [
+            self.compile_rule(rule).alias(f"rule_{i}") for i, rule in enumerate(rules)
+        ]
+
+    @staticmethod
+    def compile_rule(rule: dict) -> pl.Expr:
+        """
+        Compile a single rule into a boolean expression.
+        """
+        column = pl.col(rule.get("column", "merchant"))
+        pattern = rule["pattern"]
+        kind = rule.get("kind", "literal")
+        ignore_case = rule.get("ignore_case", False)
+        if kind == "literal":
+            if ignore_case:
+                expr = column.str.contains(f"(?i){re.escape(pattern)}")
+            else:
+                expr = column.str.contains(pattern, literal=True)
+        elif kind == "regex":
+            expr = column.str.contains(f"(?i){pattern}" if ignore_case else pattern)
+        elif kind == "exact":
+            if ignore_case:
+                expr = column.str.to_lowercase() == pattern.lower()
+            else:
+                expr = column == pattern
+        else:
+            raise ValueError(f"Unknown skip rule kind {kind!r} for {pattern!r}")
+        if "type" in rule:
+            expr = expr & (pl.col("type") == rule["type"])
+        return expr
+
+    @staticmethod
+    def _describe(rule: dict) -> str:
+        """
+        Describe a rule for the hit count report.
+        """
+        description = f"{rule.get('column', 'merchant')} {rule.get('kind', 'literal')} {rule['pattern']!r}"
+        if "type" in rule:
+            description += f" (type {rule['type']!r})"
+        return description
+
+    def match(self, df: pl.DataFrame) -> pl.Series:
+        """
+        Find the rows matched by any rule, printing the hit count of each rule.
+
+        Args:
+            df: DataFrame holding every column the rules refer to
+
+        Returns:
+            pl.Series: Boolean mask, true for rows that should be skipped. Rows
+            where a rule's column is null are not matched by that rule.
+        """
+        return self._evaluate(df).fill_null(False)
+
+    def apply(self, df: pl.DataFrame) -> pl.DataFrame:
+        """
+        Drop the rows matched by any rule.
+        Rows where a rule's column is null are dropped too, as a plain polars
+        filter would.
+        """
+        return df.filter(~self._evaluate(df))
+
+    def _evaluate(self, df: pl.DataFrame) -> pl.Series:
+        """
+        Evaluate every rule in one pass, printing the hit count of each rule.
+
+        Returns:
+            pl.Series: True for matched rows, null where a rule's column is null
+            and no other rule matched
+        """
+        if not self.exprs or df.height == 0:
+            return pl.Series("skip", [False] * df.height, dtype=pl.Boolean)
+        hits = df.lazy().select(self.exprs).collect()
+        mask = hits.select(pl.any_horizontal(pl.all()).alias("skip")).to_series()
+        print(
+            f"Skip rules ({self.name}): {mask.sum()}/{df.height} transactions matched"
+        )
+        for rule, count in zip(self.rules, hits.sum().row(0)):
+            if count > 0:
+                print(f"  {count} x {self._describe(rule)}")
+        return mask
@@ -0,0 +1,111 @@
+"""
+Substring Matcher - Match merchant names against substring auto-match rules.
+
+This module provides a class that compiles the substring_auto_match rules
+into a single multi-pattern (Aho-Corasick) search, so a merchant or a whole
+column of merchants is matched against every rule in one pass.
+"""
+
+import polars as pl
+
+
+class SubstringMatcher:
+    """
+    Match merchants against a set of substring rules.
+
+    Each rule maps a lowercase substring to one or more label columns (e.g.
+    category and subcategory). When several rules match a merchant, the longest
+    substring wins. If the longest matches point at different labels, the match
+    is ambiguous and no label is returned.
+    """
+
+    def __init__(self, rules: pl.DataFrame):
+        """
+        Compile the rule set.
+
+        Args:
+            rules: DataFrame with a "substring" column and one or more label columns
+        """
+        self.label_columns = [c for c in rules.columns if c != "substring"]
+        self.rules = (
+            rules.with_columns(pl.col("substring").str.to_lowercase())
+            .unique(maintain_order=True)
+            .with_columns(pl.col("substring").str.len_chars().alias("length"))
+        )
+        self.patterns = self.rules.get_column("substring").unique().sort().to_list()
+
+    def match_column(self, merchants: pl.Series) -> pl.DataFrame:
+        """
+        Match every merchant in a column in a single pass.
+
+        Args:
+            merchants: Series of merchant names
+
+        Returns:
+            pl.DataFrame: One row per merchant, in order, with the label columns
+            (null when there is no unambiguous match) and a "substring_candidates"
+            list column holding the tied substrings of ambiguous matches
+        """
+        df = pl.DataFrame({"merchant": merchants}).with_row_index("row")
+        if not self.patterns:
+            return df.with_columns(
+                *[
+                    pl.lit(None, dtype=self.rules.schema[c]).alias(c)
+                    for c in self.label_columns
+                ],
+                pl.lit(None, dtype=pl.List(pl.Utf8)).alias("substring_candidates"),
+            ).select(*self.label_columns, "substring_candidates")
+
+        # all rules found in each merchant, keeping only the longest substrings
+        candidates = (
+            df.select(
+                pl.col("row"),
+                pl.col("merchant")
+                .str.to_lowercase()
+                .str.extract_many(self.patterns, overlapping=True)
+                .alias("substring"),
+            )
+            .explode("substring")
+            .drop_nulls("substring")
+            .unique()
+            .join(self.rules, on="substring")
+            .filter(pl.col("length") == pl.col("length").max().over("row"))
+        )
+        resolved = candidates.group_by("row").agg(
+            pl.col(self.label_columns).sort_by("substring").first(),
+            pl.struct(self.label_columns).n_unique().alias("label_count"),
+            pl.col("substring").unique().sort().alias("substring_candidates"),
+        )
+        ambiguous = pl.col("label_count") > 1
+        return (
+            df.join(resolved, on="row", how="left")
+            .sort("row")
+            .select(
+                *[
+                    pl.when(ambiguous).then(None).otherwise(pl.col(c)).alias(c)
+                    for c in self.label_columns
+                ],
+                pl.when(ambiguous)
+                .then(pl.col("substring_candidates"))
+                .alias("substring_candidates"),
+            )
+        )
+
+    def match(self, merchant: str) -> tuple | None:
+        """
+        Match a single merchant.
+
+        Returns:
+            Tuple of label values, or None if no rule matches or the match is ambiguous
+        """
+        result = self.match_column(pl.Series([merchant])).row(0, named=True)
+        if result["substring_candidates"] is not None:
+            print(
+                f"Ambiguous substring match for {merchant}: "
+                f"{', '.join(result['substring_candidates'])} matched conflicting rules"
+            )
+            return None
+        labels = tuple(result[c] for c in self.label_columns)
+        if all(label is None for label in labels):
+            return None
+        return labels